@@ -1,50 +1,514 @@
-from fastapi import APIRouter
+import json
+from typing import Optional
+
+import pandas as pd
+from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
+
+from app.core.constants import TOU_DEFAULT_PERIOD
+from app.core.tenancy import TenantContext, get_tenant, require_cluster_token
+from app.data.ingest import (
+    REQUIRED_COLUMNS,
+    SUPPORTED_FORMATS,
+    UPLOAD_SCHEMA,
+    UnsupportedFormatError,
+    daily_totals,
+    is_interval,
+    iter_energy_file,
+    missing_columns,
+    read_energy_file,
+    to_series,
+)
+from app.data.parsers import PYARROW_AVAILABLE, engine_ranking
+from app.data.quality import clean_energy_frame
 from app.data.simulator import generate_simulated_data
-from app.services.rebound_detector import detect_rebound
-from app.services.behavior_analyzer import analyze_behavior
-from app.services.recommendation_engine import generate_recommendations
-from app.services.metrics_engine import calculate_climate_metrics
-from app.services.dashboard_formatter import format_dashboard_response
-from app.services.metrics_engine import calculate_climate_metrics
-from app.services.scenario_engine import simulate_scenario
+from app.db.rollup_store import LEVELS, PORTFOLIO
+from app.models.schemas import (
+    AnalysisRequest,
+    BenchmarkSketches,
+    ChangepointRequest,
+    EnergySeries,
+    ScenarioSweepRequest,
+)
+from app.pathway_pipeline import rebound_stream
+from app.services.analysis_pipeline import cached_rebound, run_analysis_pipeline
+from app.services.benchmark_engine import METRICS as BENCHMARK_METRICS
+from app.services.changepoint_engine import detect_changepoints, rebound_effect_series, stack_series
+from app.services.scenario_engine import parameter_values, simulate_scenario_grid
+from app.services.site_stats import site_dashboard
+from app.services.tou_engine import get_schedule, time_of_use_breakdown
+from app.utils.emission_calculator import get_intensity_table
+
+API_VERSION = "v1"
+
+# Upper bound on sites x grid points evaluated by one sweep request; the
+# engine holds several float64 cubes of this size at once
+MAX_SWEEP_SCENARIOS = 100_000
+
+# Per-site cubes go out as JSON lists, so include_site_cube allows far fewer cells
+MAX_SITE_CUBE_CELLS = 10_000
 
 router = APIRouter()
 
 @router.get("/")
 def home():
-    return {"message": "GreenGap backend running"}
+    return {"message": "GreenGap backend running", "api_version": API_VERSION}
 
 @router.get("/analyze")
-def analyze():
+def analyze(
+    seed: Optional[int] = None,
+    reduction_factor: float = 0.1,
+    tenant: TenantContext = Depends(get_tenant),
+):
+    """Runs the pipeline on simulated data (seeded for reproducible demos)"""
 
-    data = generate_simulated_data()
+    data = generate_simulated_data(seed=seed)
+    return run_analysis_pipeline(
+        data, reduction_factor=reduction_factor, cache=tenant.cache, settings=tenant.settings
+    )
+
+@router.post("/analyze")
+def analyze_series(request: AnalysisRequest, tenant: TenantContext = Depends(get_tenant)):
+    """Runs the pipeline on an inline series or a stored dataset"""
 
-    rebound_result = detect_rebound(data)
-    behavior_result = analyze_behavior(data)
-    recommendation_result = generate_recommendations(
-        rebound_result,
-        behavior_result
+    if request.dataset_id is not None:
+        record = tenant.datasets.get(request.dataset_id)
+        if record is None:
+            raise HTTPException(status_code=404, detail=f"Unknown dataset_id: {request.dataset_id}")
+        data = record["series"]
+    else:
+        data = request.series.model_dump()
+
+    result = run_analysis_pipeline(
+        data,
+        recommendation_settings=request.recommendation_settings.model_dump(),
+        reduction_factor=request.reduction_factor,
+        n_samples=request.uncertainty_samples,
+        cache=tenant.cache,
+        settings=tenant.settings,
     )
+    result["dataset_id"] = request.dataset_id
+    return result
+
+@router.post("/datasets")
+async def upload_dataset(file: UploadFile = File(...), tenant: TenantContext = Depends(get_tenant)):
+    """Stores an uploaded CSV / Excel / JSON file for later analysis"""
+
+    contents = await file.read()
+
+    try:
+        df, format_type = read_energy_file(contents, file.filename)
+    except UnsupportedFormatError:
+        raise HTTPException(
+            status_code=415,
+            detail={"error": "Unsupported file format", "supported_formats": SUPPORTED_FORMATS},
+        )
+    except (pd.errors.EmptyDataError, pd.errors.ParserError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Could not parse file: {e}")
+
+    missing_cols = missing_columns(df)
+    if missing_cols:
+        raise HTTPException(
+            status_code=422,
+            detail={"error": f"Missing required columns: {missing_cols}", "required": REQUIRED_COLUMNS},
+        )
+    if df.empty:
+        raise HTTPException(status_code=400, detail="File contains no data rows")
+    df, data_quality = clean_energy_frame(df)
+    if df.empty:
+        raise HTTPException(
+            status_code=422,
+            detail={"error": "No usable rows after data-quality checks", "data_quality": data_quality},
+        )
+    if is_interval(df):
+        df = daily_totals(df)
+
+    try:
+        series = to_series(df)
+        EnergySeries(**series)
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=422, detail=f"Data validation error: {e}")
+
+    dataset_id = tenant.datasets.put(series, source=f"{format_type} Upload: {file.filename}")
+
+    return {
+        "dataset_id": dataset_id,
+        "format": format_type,
+        "data_points": len(series["baseline"]),
+        "data_quality": data_quality
+    }
 
-    metrics_result = calculate_climate_metrics(
-        rebound_result,
-        behavior_result
+@router.get("/datasets")
+def list_datasets(tenant: TenantContext = Depends(get_tenant)):
+    return {"datasets": tenant.datasets.list()}
+
+@router.get("/datasets/{dataset_id}/analyze")
+def analyze_dataset(
+    dataset_id: str,
+    reduction_factor: float = 0.1,
+    uncertainty_samples: int = 0,
+    tenant: TenantContext = Depends(get_tenant),
+):
+    """Runs the pipeline on a stored dataset with default recommendation settings"""
+
+    record = tenant.datasets.get(dataset_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Unknown dataset_id: {dataset_id}")
+
+    if not 0 <= uncertainty_samples <= 1_000_000:
+        raise HTTPException(status_code=422, detail="uncertainty_samples must be between 0 and 1000000")
+
+    result = run_analysis_pipeline(
+        record["series"],
+        reduction_factor=reduction_factor,
+        n_samples=uncertainty_samples,
+        cache=tenant.cache,
+        settings=tenant.settings,
     )
+    result["dataset_id"] = dataset_id
+    return result
+
+@router.post("/sites/{site_id}/append")
+async def append_site_data(
+    site_id: str,
+    file: UploadFile = File(...),
+    region: Optional[str] = None,
+    group: Optional[str] = None,
+    tenant: TenantContext = Depends(get_tenant),
+):
+    """
+    Appends new days to a site's running statistics and returns the
+    refreshed dashboard. Cost is proportional to the new rows only; the
+    first append seeds the site with its full history. Large files should
+    be sorted by date, since each chunk only accepts days after the last.
+
+    The site is placed in the rollup hierarchy under group and region
+    (the file's first region when not given); later appends may move it.
+    """
+
+    contents = await file.read()
+
+    try:
+        chunks, format_type = iter_energy_file(contents, file.filename)
+    except UnsupportedFormatError:
+        raise HTTPException(
+            status_code=415,
+            detail={"error": "Unsupported file format", "supported_formats": SUPPORTED_FORMATS},
+        )
+
+    # CSV and XLSX arrive in chunks that go straight into the running sums,
+    # so only one parsed chunk is held at a time; each chunk is kept even if a later one fails
+    stats = tenant.sites.get(site_id, create=True)
+    counts = {"appended": 0, "skipped": 0}
+    with stats.lock:
+        if stats.rows == 0:
+            # A new (or evicted and re-seeded) site starts its rollups afresh
+            tenant.rollups.remove(site_id)
+        before, rows_before = dict(stats.totals), stats.rows
+        placed = False
+        try:
+            for df in chunks:
+                missing_cols = missing_columns(df)
+                if missing_cols:
+                    raise HTTPException(
+                        status_code=422,
+                        detail={"error": f"Missing required columns: {missing_cols}", "required": REQUIRED_COLUMNS},
+                    )
+                if not placed:
+                    file_region = str(df['region'].iloc[0]) if 'region' in df.columns and len(df) else None
+                    tenant.rollups.place(site_id, group=group, region=region or (file_region if rows_before == 0 else None))
+                    placed = True
+                grid_regions = df['region'] if 'region' in df.columns else region
+                intensity = get_intensity_table().lookup(grid_regions, df['date'], daily=True)
+                for key, value in stats.append(df, intensity).items():
+                    counts[key] += value
+        except (pd.errors.EmptyDataError, pd.errors.ParserError) as e:
+            raise HTTPException(status_code=400, detail=f"Could not parse file: {e}")
+        except (ValueError, TypeError) as e:
+            raise HTTPException(status_code=422, detail=f"Data validation error: {e}")
+        finally:
+            # Rows kept from earlier chunks count even when a later one fails
+            if stats.rows > rows_before:
+                delta = {name: stats.totals[name] - before[name] for name in before}
+                tenant.rollups.add(site_id, delta, stats.rows - rows_before)
+            if stats.rows == 0:
+                # Nothing was appended: leave no empty site behind
+                tenant.rollups.remove(site_id)
+                tenant.sites.discard(site_id, stats)
+        if stats.rows == 0:
+            raise HTTPException(status_code=400, detail="File contains no data rows")
+        dashboard = site_dashboard(site_id, stats, tenant.settings, tenant.rag_system)
+        _, placed_region = tenant.rollups.placement(site_id)
+        tenant.benchmarks.record(site_id, stats.metrics(tenant.settings), peer_group=placed_region)
+
+    return {
+        "status": "success",
+        "site_id": site_id,
+        "format": format_type,
+        **counts,
+        "dashboard": dashboard
+    }
+
+@router.get("/sites")
+def list_sites(tenant: TenantContext = Depends(get_tenant)):
+    return {"sites": tenant.sites.list()}
+
+@router.get("/sites/{site_id}")
+def site_status(site_id: str, tenant: TenantContext = Depends(get_tenant)):
+    """Current dashboard for a site from its running statistics"""
+
+    stats = tenant.sites.get(site_id)
+    if stats is None or stats.rows == 0:
+        raise HTTPException(status_code=404, detail=f"Unknown site_id: {site_id}")
+    with stats.lock:
+        return {"site_id": site_id, "dashboard": site_dashboard(site_id, stats, tenant.settings, tenant.rag_system)}
+
+@router.get("/rollups")
+def portfolio_rollup(depth: int = 1, tenant: TenantContext = Depends(get_tenant)):
+    """Portfolio metrics with its regions (and further levels down to depth)"""
+    return tenant.rollups.node(PORTFOLIO, PORTFOLIO, tenant.settings, depth=min(max(depth, 0), len(LEVELS)))
+
+@router.get("/rollups/{level}/{name}")
+def node_rollup(level: str, name: str, depth: int = 1, tenant: TenantContext = Depends(get_tenant)):
+    """
+    Metrics for one region, building group or site from the precomputed
+    rollups, drilling down `depth` levels; O(1) per node returned.
+    """
 
-    dashboard_response = format_dashboard_response(
-        rebound_result,
-        behavior_result,
-        recommendation_result,
-        metrics_result
+    if level not in LEVELS:
+        raise HTTPException(status_code=422, detail={"error": f"Unknown level: {level}", "levels": list(LEVELS)})
+    node = tenant.rollups.node(level, name, tenant.settings, depth=min(max(depth, 0), len(LEVELS)))
+    if node is None:
+        raise HTTPException(status_code=404, detail=f"Unknown {level}: {name}")
+    return node
+
+@router.get("/benchmarks")
+def fleet_benchmarks(peer_group: Optional[str] = None, tenant: TenantContext = Depends(get_tenant)):
+    """Distribution of each benchmark metric across the fleet or one peer group (region)"""
+    return {
+        "peer_group": peer_group,
+        "workers": tenant.benchmarks.workers(),
+        "metrics": {metric: tenant.benchmarks.peer_stats(metric, peer_group) for metric in BENCHMARK_METRICS},
+    }
+
+@router.get("/benchmarks/sites/{site_id}")
+def site_benchmark(site_id: str, tenant: TenantContext = Depends(get_tenant)):
+    """How a site compares: percentile rank in the fleet and in its peer group per metric"""
+
+    report = tenant.benchmarks.site_report(site_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail=f"Unknown site_id: {site_id}")
+    return report
+
+@router.get("/benchmarks/percentile")
+def benchmark_percentile(
+    metric: str,
+    value: float,
+    peer_group: Optional[str] = None,
+    tenant: TenantContext = Depends(get_tenant),
+):
+    """Percentile rank of any value of a metric, e.g. a what-if target"""
+
+    if metric not in BENCHMARK_METRICS:
+        raise HTTPException(status_code=422, detail={"error": f"Unknown metric: {metric}", "metrics": list(BENCHMARK_METRICS)})
+    return {"metric": metric, "value": value, "peer_group": peer_group,
+            **tenant.benchmarks.percentile(metric, value, peer_group)}
+
+@router.get("/benchmarks/sketches")
+def export_benchmark_sketches(tenant: TenantContext = Depends(get_tenant)):
+    """This worker's benchmark distributions as mergeable sketches"""
+    return tenant.benchmarks.export()
+
+@router.post("/benchmarks/sketches", dependencies=[Depends(require_cluster_token)])
+def merge_benchmark_sketches(payload: BenchmarkSketches, tenant: TenantContext = Depends(get_tenant)):
+    """
+    Merges another worker's sketches; a worker's newer export replaces its older one
+    Worker-to-worker only: requires the cluster token
+    """
+
+    tenant.benchmarks.merge(payload.model_dump())
+    return {"status": "merged", "workers": tenant.benchmarks.workers()}
+
+@router.get("/pipeline/sites")
+def pipeline_sites(tenant: TenantContext = Depends(get_tenant)):
+    """Latest per-site rebound metrics from the streaming file pipeline"""
+
+    snapshot = rebound_stream.snapshot()
+    for row in snapshot["sites"]:
+        row["rebound_level"] = tenant.settings.percent_classifier.classify(row["rebound_percentage"])
+    return snapshot
+
+@router.post("/scenarios/sweep")
+def sweep_scenarios(request: ScenarioSweepRequest, tenant: TenantContext = Depends(get_tenant)):
+    """Evaluates a reduction x efficiency x rebound grid across many sites at once"""
+
+    site_ids = [site.site_id for site in request.sites]
+    baseline_avg = [site.baseline_avg for site in request.sites]
+    actual_avg = [site.actual_avg for site in request.sites]
+
+    for dataset_id in request.dataset_ids:
+        record = tenant.datasets.get(dataset_id)
+        if record is None:
+            raise HTTPException(status_code=404, detail=f"Unknown dataset_id: {dataset_id}")
+        rebound_result = cached_rebound(record["series"], cache=tenant.cache, settings=tenant.settings)
+        site_ids.append(dataset_id)
+        baseline_avg.append(rebound_result["baseline_avg"])
+        actual_avg.append(rebound_result["actual_avg"])
+
+    grid_size = 1
+    for param in (request.reduction_factors, request.efficiency_gains, request.rebound_assumptions):
+        grid_size *= len(parameter_values(param.spec()))
+    if grid_size * len(site_ids) > MAX_SWEEP_SCENARIOS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Sweep too large: {grid_size * len(site_ids)} scenarios (max {MAX_SWEEP_SCENARIOS})",
+        )
+    if request.include_site_cube and grid_size * len(site_ids) > MAX_SITE_CUBE_CELLS:
+        raise HTTPException(
+            status_code=422,
+            detail=(
+                f"Site cube too large: {grid_size * len(site_ids)} cells (max {MAX_SITE_CUBE_CELLS}); "
+                "request fleet results only or a smaller grid"
+            ),
+        )
+
+    result = simulate_scenario_grid(
+        baseline_avg,
+        actual_avg,
+        reduction_factors=request.reduction_factors.spec(),
+        efficiency_gains=request.efficiency_gains.spec(),
+        rebound_assumptions=request.rebound_assumptions.spec(),
+        reduction_cost=request.reduction_cost,
+        efficiency_cost=request.efficiency_cost,
+        rebound_aggregate=request.rebound_aggregate,
     )
 
-    scenario_result = simulate_scenario(
-    rebound_result,
-    reduction_factor=0.1
+    response = {
+        "site_ids": site_ids,
+        "axes": {name: values.tolist() for name, values in result["axes"].items()},
+        "scenario_count": result["scenario_count"],
+        "fleet_projected_emission": result["fleet_projected_emission"].round(3).tolist(),
+        "fleet_improvement": result["fleet_improvement"].round(3).tolist(),
+        "pareto_options": result["pareto_options"]
+    }
+    if request.include_site_cube:
+        response["projected_emission"] = result["projected_emission"].round(3).tolist()
+        response["simulated_sustainability"] = result["simulated_sustainability"].round(2).tolist()
+    return response
+
+@router.post("/changepoints")
+def rebound_changepoints(request: ChangepointRequest, tenant: TenantContext = Depends(get_tenant)):
+    """Flags the day each site's rebound effect began, scanning all sites in one pass"""
+
+    site_ids = [site.site_id for site in request.sites]
+    series = [site.model_dump() for site in request.sites]
+
+    for dataset_id in request.dataset_ids:
+        record = tenant.datasets.get(dataset_id)
+        if record is None:
+            raise HTTPException(status_code=404, detail=f"Unknown dataset_id: {dataset_id}")
+        site_ids.append(dataset_id)
+        series.append(record["series"])
+
+    rebound = rebound_effect_series(
+        stack_series(series, "baseline"), stack_series(series, "expected"), stack_series(series, "actual")
+    )
+    result = detect_changepoints(
+        rebound,
+        method=request.method,
+        warmup_days=request.warmup_days,
+        drift=request.drift,
+        threshold=request.threshold,
+        max_changepoints=request.max_changepoints,
+        min_segment_days=request.min_segment_days,
+        penalty_factor=request.penalty_factor,
     )
 
+    def label(item, day):
+        if day < 0:
+            return None
+        return item["labels"][day] if item.get("labels") else day
+
+    sites = []
+    for i, item in enumerate(series):
+        onset = int(result["onset"][i])
+        site = {
+            "site_id": site_ids[i],
+            "detected": bool(result["detected"][i]),
+            "onset_day": onset if onset >= 0 else None,
+            "onset": label(item, onset),
+            "rebound_shift": round(float(result["shift"][i]), 4)
+        }
+        if "alarm" in result:
+            site["alarm"] = label(item, int(result["alarm"][i]))
+        if "changepoints" in result:
+            site["changepoints"] = [label(item, day) for day in result["changepoints"][i]]
+        sites.append(site)
+
     return {
-    "dashboard": dashboard_response,
-    "scenario_projection": scenario_result
+        "method": request.method,
+        "site_count": len(sites),
+        "detected_count": int(result["detected"].sum()),
+        "sites": sites
     }
 
+@router.post("/time-of-use")
+async def time_of_use(
+    file: UploadFile = File(...),
+    tariff: Optional[str] = Form(None),
+    tenant: TenantContext = Depends(get_tenant),
+):
+    """
+    Breaks hourly / 15-minute readings down by tariff period and day type.
+    tariff is optional JSON: {"periods": {period: {day_type: [[start_hour, end_hour], ...]}},
+    "default_period": "off_peak"}; the configured tariff is used otherwise.
+    """
+
+    try:
+        spec = json.loads(tariff) if tariff else {}
+        schedule = get_schedule(spec.get("periods"), spec.get("default_period", TOU_DEFAULT_PERIOD))
+    except (ValueError, TypeError, AttributeError) as e:
+        raise HTTPException(status_code=422, detail=f"Invalid tariff: {e}")
+
+    contents = await file.read()
+    try:
+        df, format_type = read_energy_file(contents, file.filename)
+    except UnsupportedFormatError:
+        raise HTTPException(
+            status_code=415,
+            detail={"error": "Unsupported file format", "supported_formats": SUPPORTED_FORMATS},
+        )
+    except (pd.errors.EmptyDataError, pd.errors.ParserError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Could not parse file: {e}")
+
+    missing_cols = missing_columns(df)
+    if missing_cols:
+        raise HTTPException(
+            status_code=422,
+            detail={"error": f"Missing required columns: {missing_cols}", "required": REQUIRED_COLUMNS},
+        )
+    if not is_interval(df):
+        raise HTTPException(status_code=422, detail="Time-of-use breakdown needs hourly or sub-hourly readings")
+
+    baseline = df['baseline_kwh'].to_numpy()
+    breakdown = time_of_use_breakdown(
+        df['date'].to_numpy(),
+        baseline,
+        baseline * (1 - df['efficiency_improvement'].to_numpy()),
+        df['actual_kwh'].to_numpy(),
+        schedule,
+    )
+    return {"format": format_type, **breakdown}
+
+@router.get("/parsers")
+def parser_engines():
+    """Upload parser engines per format, fastest first, with measured MB/s"""
+    return {"pyarrow_available": PYARROW_AVAILABLE, **engine_ranking(UPLOAD_SCHEMA)}
+
+@router.get("/cache/stats")
+def cache_stats(tenant: TenantContext = Depends(get_tenant)):
+    return tenant.cache.stats()
+
+@router.get("/tenant")
+def tenant_usage(tenant: TenantContext = Depends(get_tenant)):
+    """Cache, dataset and LLM budget usage for the calling tenant"""
+    return tenant.usage()
@@ -0,0 +1,143 @@
+import json
+import os
+from dataclasses import dataclass, fields, replace
+from functools import cached_property, lru_cache
+from typing import Optional, Tuple
+
+import numpy as np
+
+from app.core import constants
+
+ENV_PREFIX = "GREENGAP_"
+
+
+class LevelClassifier:
+    """
+    Assigns LOW / MEDIUM / HIGH labels from precomputed bin edges.
+
+    right=True puts values equal to an edge in the lower bin (x > edge
+    moves up a level); right=False puts them in the upper bin.
+    Arrays of any shape are classified in one np.digitize call.
+    """
+
+    def __init__(self, edges, labels=constants.REBOUND_LEVELS, right: bool = False):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.labels = np.asarray(labels)
+        self.right = right
+
+        if len(self.labels) != len(self.edges) + 1:
+            raise ValueError("Need exactly one more label than bin edges")
+        if np.any(np.diff(self.edges) < 0):
+            raise ValueError("Bin edges must be increasing")
+
+    def codes(self, values) -> np.ndarray:
+        return np.digitize(np.asarray(values, dtype=np.float64), self.edges, right=self.right)
+
+    def classify(self, values):
+        """Returns a label for a scalar, or an array of labels for an array."""
+        labels = self.labels[self.codes(values)]
+        return str(labels) if np.ndim(labels) == 0 else labels
+
+
+@dataclass(frozen=True)
+class Settings:
+    """
+    Typed runtime settings, built once from constants plus GREENGAP_* env
+    vars, optionally overridden per tenant.
+    """
+
+    gemini_model: str = constants.GEMINI_MODEL
+    rebound_percent_thresholds: Tuple[float, float] = constants.REBOUND_PERCENT_THRESHOLDS
+    rebound_index_thresholds: Tuple[float, float] = constants.REBOUND_INDEX_THRESHOLDS
+    efficiency_weight: float = constants.EFFICIENCY_WEIGHT
+    behavior_weight: float = constants.BEHAVIOR_WEIGHT
+    projection_blend: float = constants.PROJECTION_BLEND
+    default_emission_factor: float = constants.DEFAULT_EMISSION_FACTOR
+    grid_intensity_max_age_days: float = constants.GRID_INTENSITY_MAX_AGE_DAYS
+    monte_carlo_samples: int = constants.MONTE_CARLO_SAMPLES
+    inline_monte_carlo_samples: int = constants.INLINE_MONTE_CARLO_SAMPLES
+    tenant_cache_bytes: int = constants.TENANT_CACHE_BYTES
+    tenant_cache_entries: int = constants.TENANT_CACHE_ENTRIES
+    llm_requests_per_minute: float = constants.LLM_REQUESTS_PER_MINUTE
+    llm_burst: int = constants.LLM_BURST
+    total_cache_bytes: int = constants.TOTAL_CACHE_BYTES
+    global_llm_requests_per_minute: float = constants.GLOBAL_LLM_REQUESTS_PER_MINUTE
+    global_llm_burst: int = constants.GLOBAL_LLM_BURST
+    chat_context_tokens: int = constants.CHAT_CONTEXT_TOKENS
+    job_workers: int = constants.JOB_WORKERS
+    job_retention_seconds: int = constants.JOB_RETENTION_SECONDS
+    report_cache_bytes: int = constants.REPORT_CACHE_BYTES
+    rolling_window_days: int = constants.ROLLING_WINDOW_DAYS
+    forecast_horizon_days: int = constants.FORECAST_HORIZON_DAYS
+
+    def __post_init__(self):
+        for name in ("monte_carlo_samples", "inline_monte_carlo_samples"):
+            if getattr(self, name) < 1:
+                raise ValueError(f"{name} must be at least 1")
+
+    @cached_property
+    def percent_classifier(self) -> LevelClassifier:
+        """Rebound percentage -> level (> edge moves up, as in /upload-data)"""
+        return LevelClassifier(self.rebound_percent_thresholds, right=True)
+
+    @cached_property
+    def index_classifier(self) -> LevelClassifier:
+        """Rebound index -> level (>= edge moves up, as in detect_rebound)"""
+        return LevelClassifier(self.rebound_index_thresholds, right=False)
+
+    def sustainability_index(self, efficiency_score, behavior_score):
+        return efficiency_score * self.efficiency_weight + behavior_score * self.behavior_weight
+
+    def with_overrides(self, overrides: dict) -> "Settings":
+        known = {f.name: f for f in fields(self)}
+        unknown = set(overrides) - set(known)
+        if unknown:
+            raise ValueError(f"Unknown settings: {sorted(unknown)}")
+        return replace(self, **{k: _coerce(v, getattr(self, k)) for k, v in overrides.items()})
+
+
+def _coerce(value, default):
+    """Converts an env string or JSON value to the type of the default."""
+    if isinstance(default, tuple):
+        if isinstance(value, str):
+            value = [v for v in value.split(",") if v.strip()]
+        return tuple(float(v) for v in value)
+    if isinstance(default, bool):
+        return value if isinstance(value, bool) else str(value).lower() in ("1", "true", "yes")
+    if isinstance(default, int):
+        return int(value)
+    if isinstance(default, float):
+        return float(value)
+    return str(value)
+
+
+def _env_overrides():
+    overrides = {}
+    for f in fields(Settings):
+        value = os.getenv(ENV_PREFIX + f.name.upper())
+        if value is not None:
+            overrides[f.name] = value
+    return overrides
+
+
+@lru_cache(maxsize=1)
+def _tenant_overrides():
+    """Per-tenant overrides from the JSON file in GREENGAP_TENANT_SETTINGS_FILE"""
+    path = os.getenv(ENV_PREFIX + "TENANT_SETTINGS_FILE")
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+@lru_cache(maxsize=None)
+def get_settings(tenant_id: Optional[str] = None) -> Settings:
+    """
+    Returns the process-wide settings, or the tenant's variant when the
+    tenant has overrides. Each variant is built once and cached.
+    """
+    base = Settings().with_overrides(_env_overrides())
+    if tenant_id is None:
+        return base
+    overrides = _tenant_overrides().get(tenant_id)
+    return base.with_overrides(overrides) if overrides else base
@@ -0,0 +1,91 @@
+# Shared defaults for GreenGap analytics. Runtime values come from
+# app.core.config.Settings, which starts from these and applies env /
+# per-tenant overrides.
+
+REBOUND_LEVELS = ("LOW", "MEDIUM", "HIGH")
+
+# Rebound percentage (0-100) of expected savings lost, as reported by
+# /upload-data: > 30 is MEDIUM, > 60 is HIGH
+REBOUND_PERCENT_THRESHOLDS = (30.0, 60.0)
+
+# Rebound index (0-1) from detect_rebound: >= 0.2 is MEDIUM, >= 0.5 is HIGH
+REBOUND_INDEX_THRESHOLDS = (0.2, 0.5)
+
+# Sustainability index = efficiency * 0.6 + behavior * 0.4
+EFFICIENCY_WEIGHT = 0.6
+BEHAVIOR_WEIGHT = 0.4
+
+# Share of the rebound gap kept in the corrected projection
+PROJECTION_BLEND = 0.5
+
+# kg CO2 per kWh when no grid intensity table covers a region
+DEFAULT_EMISSION_FACTOR = 0.5
+
+# A grid intensity series value covers readings up to this many days after
+# its timestamp; later readings use the profile / default factor instead
+GRID_INTENSITY_MAX_AGE_DAYS = 7
+
+GEMINI_MODEL = "models/gemini-2.0-flash-exp"
+
+# Bootstrap resamples for uncertainty bands: the full count runs in background
+# jobs, synchronous /upload-data requests use the smaller inline count
+MONTE_CARLO_SAMPLES = 100_000
+INLINE_MONTE_CARLO_SAMPLES = 5_000
+
+# Per-tenant cache quota and LLM token bucket (requests refill per minute)
+TENANT_CACHE_BYTES = 32 * 1024 * 1024
+TENANT_CACHE_ENTRIES = 2048
+LLM_REQUESTS_PER_MINUTE = 30.0
+LLM_BURST = 10
+
+# Process-wide caps over all tenants: combined tenant cache size and one
+# LLM token bucket every call must also pass
+TOTAL_CACHE_BYTES = 512 * 1024 * 1024
+GLOBAL_LLM_REQUESTS_PER_MINUTE = 60.0
+GLOBAL_LLM_BURST = 20
+
+# Estimated tokens of knowledge packed into a chat prompt, and how many
+# knowledge documents are retrieved per question. The budget is below the
+# shortest topic answer, so the topic answer and retrieved documents are
+# always cut to their best sentences and a grounded prompt stays smaller
+# than the old answer-only prompt
+CHAT_CONTEXT_TOKENS = 160
+CHAT_RETRIEVED_DOCS = 5
+
+# Background job workers and how long finished jobs are kept (seconds)
+JOB_WORKERS = 2
+JOB_RETENTION_SECONDS = 24 * 60 * 60
+
+# Disk space for rendered PDF reports, reused for identical export payloads
+REPORT_CACHE_BYTES = 256 * 1024 * 1024
+
+# Days of history kept per site for the rolling rebound figure and chart
+ROLLING_WINDOW_DAYS = 30
+
+# Days ahead covered by the Holt-Winters consumption forecast
+FORECAST_HORIZON_DAYS = 14
+
+# Days with degree-day data a site needs before its weather response is fitted
+WEATHER_MIN_FIT_DAYS = 14
+
+# Time-of-use tariff: period -> day type -> [start_hour, end_hour) ranges,
+# matched on 15-minute slots; slots not listed are off-peak
+TOU_PERIODS = {
+    "peak": {"weekday": [(17, 21)]},
+    "shoulder": {"weekday": [(7, 17), (21, 22)], "weekend": [(17, 21)]},
+}
+TOU_DEFAULT_PERIOD = "off_peak"
+
+# Changepoint scan: warm-up days that set a site's post-upgrade rebound level,
+# and binary-segmentation limits (penalty is this factor times log(days))
+CHANGEPOINT_WARMUP_DAYS = 30
+CHANGEPOINT_MAX_CHANGEPOINTS = 5
+CHANGEPOINT_MIN_SEGMENT_DAYS = 7
+CHANGEPOINT_PENALTY_FACTOR = 3.0
+
+# Upload data-quality stage: gaps of up to this many intervals are
+# interpolated; readings beyond THRESHOLD robust sigmas of the centered
+# rolling median over WINDOW intervals are flagged as meter spikes
+QUALITY_MAX_GAP_STEPS = 3
+QUALITY_MAD_WINDOW = 21
+QUALITY_MAD_THRESHOLD = 8.0
@@ -0,0 +1,257 @@
+import hashlib
+import hmac
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+from fastapi import HTTPException, Request
+
+from app.core.config import ENV_PREFIX, Settings, get_settings
+from app.db.dataset_store import DatasetStore
+from app.db.rollup_store import RollupTree
+from app.db.site_store import SiteStatsStore
+from app.pathway_pipeline import PathwayRAGSystem, rag_system
+from app.services.benchmark_engine import FleetBenchmark
+from app.services.pipeline_cache import ByteBudget, StageCache
+
+TENANT_HEADER = "X-Tenant-ID"
+API_KEY_HEADER = "X-API-Key"
+CLUSTER_TOKEN_HEADER = "X-Cluster-Token"
+DEFAULT_TENANT = "public"
+
+_TENANT_ID_PATTERN = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+# Tenants come from configuration, but bound how many contexts exist regardless
+MAX_TENANTS = 1000
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: refills at `rate` tokens per second up to
+    `capacity`. Used to cap each tenant's LLM calls.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def release(self, tokens: float = 1.0):
+        """Gives back tokens taken for a call that did not happen."""
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + tokens)
+
+    def try_acquire(self, tokens: float = 1.0):
+        """Returns (allowed, retry_after_seconds)."""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True, 0.0
+            missing = tokens - self._tokens
+            return False, (missing / self.rate) if self.rate > 0 else float("inf")
+
+    @property
+    def available(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+
+@dataclass
+class TenantContext:
+    """Everything a request may touch that must not leak across tenants."""
+
+    tenant_id: str
+    settings: Settings
+    rag_system: PathwayRAGSystem
+    cache: StageCache
+    datasets: DatasetStore
+    sites: SiteStatsStore
+    rollups: RollupTree
+    benchmarks: FleetBenchmark
+    llm_bucket: TokenBucket
+    created_at: float = field(default_factory=time.time)
+
+    def acquire_llm(self):
+        """
+        Takes one LLM token from this tenant's bucket and the process-wide
+        one; returns (allowed, retry_after_seconds).
+        """
+        allowed, retry_after = self.llm_bucket.try_acquire()
+        if not allowed:
+            return allowed, retry_after
+        allowed, retry_after = global_llm_bucket.try_acquire()
+        if not allowed:
+            self.llm_bucket.release()
+        return allowed, retry_after
+
+    def usage(self):
+        return {
+            "tenant_id": self.tenant_id,
+            "cache": self.cache.stats(),
+            "datasets": len(self.datasets.list()),
+            "sites": len(self.sites.list()),
+            "rollup_nodes": len(self.rollups),
+            "benchmarked_sites": len(self.benchmarks),
+            "llm_tokens_available": round(self.llm_bucket.available, 2),
+            "llm_requests_per_minute": self.settings.llm_requests_per_minute,
+            "knowledge_base_size": len(self.rag_system.knowledge_docs)
+        }
+
+
+def _load_tenant_knowledge(tenant_id: str):
+    """Extra knowledge docs from GREENGAP_TENANT_KNOWLEDGE_DIR/<tenant>.json"""
+    directory = os.getenv(ENV_PREFIX + "TENANT_KNOWLEDGE_DIR")
+    if not directory:
+        return []
+    path = os.path.join(directory, f"{tenant_id}.json")
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class TenantRegistry:
+    """Creates tenant contexts lazily and keeps one per tenant ID."""
+
+    def __init__(self):
+        self._tenants = {}
+        self._lock = threading.Lock()
+
+    def get(self, tenant_id: str) -> TenantContext:
+        with self._lock:
+            context = self._tenants.get(tenant_id)
+            if context is None:
+                if len(self._tenants) >= MAX_TENANTS and tenant_id != DEFAULT_TENANT:
+                    print(f" Tenant limit reached, serving '{tenant_id}' as {DEFAULT_TENANT}")
+                    return self.get_default_locked()
+                context = self._create(tenant_id)
+                self._tenants[tenant_id] = context
+            return context
+
+    def _create(self, tenant_id: str) -> TenantContext:
+        settings = get_settings(None if tenant_id == DEFAULT_TENANT else tenant_id)
+        extra_docs = _load_tenant_knowledge(tenant_id)
+
+        return TenantContext(
+            tenant_id=tenant_id,
+            settings=settings,
+            # Tenants without their own documents share the base knowledge base
+            rag_system=PathwayRAGSystem(extra_docs=extra_docs) if extra_docs else rag_system,
+            cache=StageCache(
+                max_entries=settings.tenant_cache_entries,
+                max_bytes=settings.tenant_cache_bytes,
+                budget=tenant_cache_budget,
+            ),
+            datasets=DatasetStore(),
+            sites=SiteStatsStore(window_days=settings.rolling_window_days),
+            rollups=RollupTree(),
+            benchmarks=FleetBenchmark(worker_id=f"{os.getpid()}:{tenant_id}"),
+            llm_bucket=TokenBucket(
+                rate=settings.llm_requests_per_minute / 60.0,
+                capacity=settings.llm_burst,
+            ),
+        )
+
+    def get_default_locked(self) -> TenantContext:
+        context = self._tenants.get(DEFAULT_TENANT)
+        if context is None:
+            context = self._tenants[DEFAULT_TENANT] = self._create(DEFAULT_TENANT)
+        return context
+
+    def tenant_ids(self):
+        with self._lock:
+            return sorted(self._tenants)
+
+
+# Shared by all tenants, so adding tenants cannot multiply the LLM rate or cache memory
+global_llm_bucket = TokenBucket(
+    rate=get_settings().global_llm_requests_per_minute / 60.0,
+    capacity=get_settings().global_llm_burst,
+)
+tenant_cache_budget = ByteBudget(get_settings().total_cache_bytes)
+
+tenant_registry = TenantRegistry()
+
+
+def hash_api_key(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+@lru_cache(maxsize=1)
+def _api_key_tenants():
+    """
+    SHA-256 hex digest of each API key -> tenant ID, from the JSON file in
+    GREENGAP_API_KEYS_FILE ({"tenant": ["<digest>", ...]}). Only digests
+    are stored, so the file does not hold usable keys.
+    """
+    path = os.getenv(ENV_PREFIX + "API_KEYS_FILE")
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        tenants = json.load(f)
+    return {digest.lower(): tenant_id for tenant_id, digests in tenants.items() for digest in digests}
+
+
+def _allowed_tenants():
+    """Allowlist from GREENGAP_TENANTS (comma separated), used when no API keys are configured"""
+    value = os.getenv(ENV_PREFIX + "TENANTS", "")
+    return {t.strip() for t in value.split(",") if t.strip()}
+
+
+def resolve_tenant_id(request: Request) -> str:
+    """
+    The caller's tenant: the one its X-API-Key belongs to, or, when no API
+    keys are configured, an allowlisted X-Tenant-ID. Requests with neither
+    header use the shared default tenant. Unknown keys get a 401 and
+    unknown or mismatched tenant IDs a 403, never a fresh tenant.
+    """
+    claimed = request.headers.get(TENANT_HEADER, "").strip()
+    api_key = request.headers.get(API_KEY_HEADER, "").strip()
+    key_tenants = _api_key_tenants()
+
+    if api_key:
+        tenant_id = key_tenants.get(hash_api_key(api_key))
+        if tenant_id is None:
+            raise HTTPException(status_code=401, detail="Unknown API key")
+        if claimed and claimed != tenant_id:
+            raise HTTPException(status_code=403, detail="API key does not belong to this tenant")
+        return tenant_id
+
+    if not claimed or claimed == DEFAULT_TENANT:
+        return DEFAULT_TENANT
+    if key_tenants:
+        raise HTTPException(status_code=401, detail=f"Tenant '{claimed}' requires an {API_KEY_HEADER} header")
+    if not _TENANT_ID_PATTERN.match(claimed) or claimed not in _allowed_tenants():
+        raise HTTPException(status_code=403, detail=f"Unknown tenant '{claimed}'")
+    return claimed
+
+
+def require_cluster_token(request: Request):
+    """
+    FastAPI dependency for worker-to-worker endpoints: the caller must send
+    GREENGAP_CLUSTER_TOKEN in X-Cluster-Token. Without a configured token
+    these endpoints are disabled.
+    """
+    token = os.getenv(ENV_PREFIX + "CLUSTER_TOKEN", "")
+    if not token:
+        raise HTTPException(status_code=403, detail="Worker endpoints are disabled (no cluster token configured)")
+    presented = request.headers.get(CLUSTER_TOKEN_HEADER, "")
+    if not hmac.compare_digest(presented.encode("utf-8"), token.encode("utf-8")):
+        raise HTTPException(status_code=403, detail="Invalid cluster token")
+
+
+def get_tenant(request: Request) -> TenantContext:
+    """FastAPI dependency returning the caller's tenant context"""
+    return tenant_registry.get(resolve_tenant_id(request))
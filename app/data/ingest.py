@@ -0,0 +1,169 @@
+import numpy as np
+import pandas as pd
+
+from app.data.parsers import CHUNK_ROWS, ColumnSchema, format_from_filename, iter_chunks, parse, sniff_format
+
+REQUIRED_COLUMNS = ['date', 'baseline_kwh', 'actual_kwh', 'efficiency_improvement']
+
+SUPPORTED_FORMATS = ["CSV (.csv)", "Excel (.xlsx, .xls)", "JSON (.json)", "JSON Lines (.jsonl)"]
+
+# Compact in-memory schema for uploads: float32 readings and categorical
+# labels. Sums over these columns should accumulate in float64.
+VALUE_COLUMNS = ['baseline_kwh', 'actual_kwh', 'efficiency_improvement']
+CATEGORY_COLUMNS = ['site_id', 'region']
+
+# Other names accepted for the date column, e.g. in hourly / 15-minute exports
+DATE_ALIASES = ['timestamp', 'datetime']
+
+
+class UnsupportedFormatError(ValueError):
+    """Raised when an uploaded file is not CSV, Excel, JSON or JSON lines."""
+
+
+FORMAT_LABELS = {
+    "csv": "CSV",
+    "xlsx": "Excel (XLSX)",
+    "xls": "Excel (XLS)",
+    "json": "JSON",
+    "jsonl": "JSON Lines",
+}
+
+# Parse-time column selection and dtype hints for uploads
+UPLOAD_SCHEMA = ColumnSchema(
+    required=tuple(REQUIRED_COLUMNS),
+    optional=tuple(CATEGORY_COLUMNS),
+    dtypes=tuple(
+        [(col, np.float32) for col in VALUE_COLUMNS] + [(col, 'category') for col in CATEGORY_COLUMNS]
+    ),
+)
+
+
+def detect_format(contents: bytes, filename: str = None):
+    """
+    Format from the content bytes, falling back to the file extension
+    only when the bytes are inconclusive.
+    """
+    return sniff_format(contents) or format_from_filename(filename)
+
+
+def read_energy_file(contents: bytes, filename: str):
+    """
+    Parses uploaded energy data into a DataFrame.
+
+    The format is sniffed from the content and parsed with the fastest
+    available engine, reading only the schema columns. Returns
+    (df, format_type). Raises UnsupportedFormatError when the format
+    cannot be determined; parser errors propagate unchanged.
+    """
+    fmt = detect_format(contents, filename)
+    if fmt is None:
+        raise UnsupportedFormatError(f"Unsupported file format: {filename}")
+
+    if fmt == "xlsx":
+        # The analysis needs the whole sheet, but compacting each streamed
+        # chunk first means it is only ever held whole in compact form
+        chunks = [compact_frame(chunk) for chunk in iter_chunks(contents, fmt, UPLOAD_SCHEMA)]
+        return compact_frame(pd.concat(chunks, ignore_index=True)), FORMAT_LABELS[fmt]
+
+    df, _ = parse(contents, fmt, UPLOAD_SCHEMA)
+    return compact_frame(df), FORMAT_LABELS[fmt]
+
+
+def iter_energy_file(contents: bytes, filename: str, chunk_rows: int = CHUNK_ROWS):
+    """
+    Like read_energy_file, but returns (chunks, format_type) where chunks
+    yields compact frames of at most chunk_rows rows for CSV and XLSX, so
+    aggregators can consume large files without holding them whole.
+    """
+    fmt = detect_format(contents, filename)
+    if fmt is None:
+        raise UnsupportedFormatError(f"Unsupported file format: {filename}")
+
+    chunks = (compact_frame(chunk) for chunk in iter_chunks(contents, fmt, UPLOAD_SCHEMA, chunk_rows))
+    return chunks, FORMAT_LABELS[fmt]
+
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converts a parsed upload to the compact schema: datetime64 dates,
+    float32 readings and categorical site / region labels. Columns the
+    analysis does not use are dropped. Frames missing required columns
+    are returned unchanged so callers can report what is missing.
+    """
+    if 'date' not in df.columns:
+        alias = next((col for col in DATE_ALIASES if col in df.columns), None)
+        if alias is not None:
+            df = df.rename(columns={alias: 'date'})
+    if missing_columns(df):
+        return df
+
+    keep = REQUIRED_COLUMNS + [col for col in CATEGORY_COLUMNS if col in df.columns]
+    columns = {'date': pd.to_datetime(df['date'])}
+    for col in VALUE_COLUMNS:
+        values = df[col]
+        if not pd.api.types.is_numeric_dtype(values):
+            values = pd.to_numeric(values)
+        columns[col] = values.astype(np.float32)
+    for col in keep[len(REQUIRED_COLUMNS):]:
+        columns[col] = df[col].astype('category')
+
+    return pd.DataFrame(columns, index=df.index)[keep]
+
+
+def is_interval(df: pd.DataFrame) -> bool:
+    """True for sub-daily readings (hourly, 15-minute, ...): any time other than midnight."""
+    dates = df['date']
+    return bool((dates != dates.dt.normalize()).any())
+
+
+def daily_totals(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Sums interval readings into one row per day (and site / region when
+    present), in the compact schema. efficiency_improvement becomes the
+    day's kWh-weighted figure, so expected consumption sums are unchanged.
+    """
+    baseline = df['baseline_kwh'].to_numpy(dtype=np.float64)
+    readings = pd.DataFrame({
+        'baseline_kwh': baseline,
+        'actual_kwh': df['actual_kwh'].to_numpy(dtype=np.float64),
+        'expected_kwh': baseline * (1 - df['efficiency_improvement'].to_numpy(dtype=np.float64)),
+    }, index=df.index)
+
+    keys = [df['date'].dt.normalize()] + [df[col] for col in CATEGORY_COLUMNS if col in df.columns]
+    daily = readings.groupby(keys, observed=True, sort=True).sum().reset_index()
+
+    total_baseline = daily['baseline_kwh'].to_numpy()
+    daily['efficiency_improvement'] = np.divide(
+        total_baseline - daily['expected_kwh'].to_numpy(), total_baseline,
+        out=np.zeros(len(daily)), where=total_baseline > 0
+    )
+    return compact_frame(daily.drop(columns='expected_kwh'))
+
+
+def bytes_per_row(df: pd.DataFrame) -> float:
+    """In-memory size of df per row, counting object / string payloads."""
+    if len(df) == 0:
+        return 0.0
+    return float(df.memory_usage(deep=True).sum()) / len(df)
+
+
+def missing_columns(df: pd.DataFrame):
+    """Returns the required columns absent from df."""
+    return [col for col in REQUIRED_COLUMNS if col not in df.columns]
+
+
+def to_series(df: pd.DataFrame):
+    """
+    Converts a validated upload into the baseline / expected / actual
+    series consumed by app.services.
+    """
+    dates = pd.to_datetime(df['date'])
+    baseline = df['baseline_kwh'].to_numpy(dtype=np.float64)
+    expected = baseline * (1 - df['efficiency_improvement'].to_numpy(dtype=np.float64))
+
+    return {
+        "labels": dates.dt.strftime('%Y-%m-%d').tolist(),
+        "baseline": baseline.tolist(),
+        "expected": expected.tolist(),
+        "actual": df['actual_kwh'].to_numpy(dtype=np.float64).tolist()
+    }
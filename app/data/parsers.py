@@ -0,0 +1,355 @@
+import csv
+import io
+import json
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_XLSX_MAGIC = b"PK\x03\x04"
+_XLS_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+_BOM = b"\xef\xbb\xbf"
+
+_SNIFF_BYTES = 64 * 1024
+
+# Rows per DataFrame when a file is read in chunks
+CHUNK_ROWS = 50_000
+
+EXTENSION_FORMATS = {
+    ".csv": "csv",
+    ".xlsx": "xlsx",
+    ".xls": "xls",
+    ".json": "json",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+}
+
+
+@dataclass(frozen=True)
+class ColumnSchema:
+    """
+    Columns a parser should keep, with dtype hints as (column, dtype)
+    pairs. Column selection only applies when every required column is
+    present, so validation errors can still list what the file contains.
+    """
+
+    required: tuple
+    optional: tuple = ()
+    dtypes: tuple = ()
+
+    @property
+    def columns(self):
+        return self.required + self.optional
+
+    def has_required(self, names) -> bool:
+        names = set(names)
+        return all(col in names for col in self.required)
+
+
+def _is_json_lines(text: bytes) -> bool:
+    """
+    JSON lines: the first two non-blank lines are each a complete object.
+    A lone object is a record when its values are scalars; a column- or
+    index-oriented document (pandas to_json) nests dicts or lists instead.
+    """
+    lines = [line for line in text.split(b"\n", 2)[:2] if line.strip()]
+    try:
+        objects = [json.loads(line) for line in lines]
+    except ValueError:
+        return False
+    if not all(isinstance(obj, dict) for obj in objects):
+        return False
+    if len(objects) > 1:
+        return True
+    return not any(isinstance(value, (dict, list)) for value in objects[0].values())
+
+
+def sniff_format(contents: bytes):
+    """
+    Detects csv / json / jsonl / xlsx / xls from the leading bytes.
+    Returns None when the content does not look like any of them.
+    """
+    head = contents[:_SNIFF_BYTES]
+    if head.startswith(_XLSX_MAGIC):
+        return "xlsx"
+    if head.startswith(_XLS_MAGIC):
+        return "xls"
+
+    text = head.lstrip(_BOM + b" \t\r\n")
+    if not text or b"\x00" in text:
+        return None
+    if text.startswith(b"["):
+        return "json"
+    if text.startswith(b"{"):
+        return "jsonl" if _is_json_lines(text) else "json"
+
+    first_line = text.split(b"\n", 1)[0]
+    if any(sep in first_line for sep in (b",", b";", b"\t")):
+        return "csv"
+    return None
+
+
+def format_from_filename(filename: str):
+    filename = (filename or "").lower()
+    for extension, fmt in EXTENSION_FORMATS.items():
+        if filename.endswith(extension):
+            return fmt
+    return None
+
+
+def _csv_usecols(contents: bytes, schema):
+    """Schema columns present in the CSV header, or None to read everything."""
+    if schema is None:
+        return None
+    first_line = contents[:_SNIFF_BYTES].split(b"\n", 1)[0].lstrip(_BOM).decode("utf-8", errors="replace")
+    header = [name.strip() for name in next(csv.reader([first_line]), [])]
+    if not schema.has_required(header):
+        return None
+    return [name for name in header if name in schema.columns]
+
+
+def _csv_reader(engine):
+    def read(contents, schema=None):
+        usecols = _csv_usecols(contents, schema)
+        dtype = {col: t for col, t in schema.dtypes if col in usecols} if usecols else None
+        return pd.read_csv(io.BytesIO(contents), engine=engine, usecols=usecols, dtype=dtype or None)
+    return read
+
+
+def _select(df, schema):
+    if schema is None or not schema.has_required(df.columns):
+        return df
+    return df[[col for col in schema.columns if col in df.columns]]
+
+
+def _loads(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def _read_json_pandas(contents, schema=None):
+    return _select(pd.read_json(io.BytesIO(contents)), schema)
+
+
+def _read_json_records(contents, schema=None):
+    return _select(pd.DataFrame.from_records(_loads(contents)), schema)
+
+
+def _read_jsonl_pandas(contents, schema=None):
+    return _select(pd.read_json(io.BytesIO(contents), lines=True), schema)
+
+
+def _read_jsonl_pyarrow(contents, schema=None):
+    return _select(pd.read_json(io.BytesIO(contents), lines=True, engine="pyarrow"), schema)
+
+
+def _read_jsonl_records(contents, schema=None):
+    records = [_loads(line) for line in contents.splitlines() if line.strip()]
+    return _select(pd.DataFrame.from_records(records), schema)
+
+
+def iter_xlsx_chunks(contents: bytes, schema=None, chunk_rows: int = CHUNK_ROWS):
+    """
+    Streams the first worksheet as DataFrames of chunk_rows rows.
+
+    Uses openpyxl's read-only mode with iter_rows(values_only=True), so
+    cells are decoded row by row instead of building the workbook object
+    model. Only one chunk of raw rows is held at a time; parsed memory
+    stays at one chunk only if the caller does not keep the chunks (the
+    append route folds them into running sums, while uploads concatenate
+    them). Raises
+    EmptyDataError for a sheet without a header or without data rows.
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(io.BytesIO(contents), read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            raise pd.errors.EmptyDataError("Worksheet is empty")
+
+        names = [
+            str(name).strip() if name is not None else f"Unnamed: {i}"
+            for i, name in enumerate(header)
+        ]
+        if schema is not None and schema.has_required(names):
+            keep = [i for i, name in enumerate(names) if name in schema.columns]
+        else:
+            keep = list(range(len(names)))
+        columns = [names[i] for i in keep]
+        width = len(names)
+
+        buffer = []
+        data_rows = 0
+        for row in rows:
+            if not any(value is not None for value in row):
+                continue
+            if len(row) < width:
+                row = row + (None,) * (width - len(row))
+            buffer.append([row[i] for i in keep])
+            data_rows += 1
+            if len(buffer) >= chunk_rows:
+                yield pd.DataFrame.from_records(buffer, columns=columns)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame.from_records(buffer, columns=columns)
+        if data_rows == 0:
+            raise pd.errors.EmptyDataError("Worksheet has a header but no data rows")
+    finally:
+        workbook.close()
+
+
+def iter_csv_chunks(contents: bytes, schema=None, chunk_rows: int = CHUNK_ROWS):
+    """CSV in chunk_rows pieces with the same column selection and dtype hints."""
+    usecols = _csv_usecols(contents, schema)
+    dtype = {col: t for col, t in schema.dtypes if col in usecols} if usecols else None
+    yield from pd.read_csv(io.BytesIO(contents), usecols=usecols, dtype=dtype or None, chunksize=chunk_rows)
+
+
+CHUNKED_READERS = {
+    "xlsx": iter_xlsx_chunks,
+    "csv": iter_csv_chunks,
+}
+
+
+def _read_xlsx_stream(contents, schema=None):
+    chunks = list(iter_xlsx_chunks(contents, schema))
+    return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+
+
+def _read_xlsx(contents, schema=None):
+    return pd.read_excel(io.BytesIO(contents), engine="openpyxl")
+
+
+def _read_xls(contents, schema=None):
+    return pd.read_excel(io.BytesIO(contents), engine="xlrd")
+
+
+def _engines():
+    """Candidate parsers per format, in default preference order."""
+    records_name = "orjson" if orjson is not None else "json"
+    engines = {
+        "csv": {"c": _csv_reader("c")},
+        "json": {records_name: _read_json_records, "pandas": _read_json_pandas},
+        "jsonl": {records_name: _read_jsonl_records, "pandas": _read_jsonl_pandas},
+        "xlsx": {"openpyxl-stream": _read_xlsx_stream, "openpyxl": _read_xlsx},
+        "xls": {"xlrd": _read_xls},
+    }
+    if PYARROW_AVAILABLE:
+        engines["csv"] = {"pyarrow": _csv_reader("pyarrow"), **engines["csv"]}
+        engines["jsonl"] = {"pyarrow": _read_jsonl_pyarrow, **engines["jsonl"]}
+    return engines
+
+
+PARSERS = _engines()
+
+# Formats worth benchmarking (Excel has one engine per format)
+BENCHMARK_FORMATS = ("csv", "json", "jsonl")
+
+
+def _sample_bytes(fmt: str, rows: int) -> bytes:
+    """Synthetic upload in the given format, shaped like real energy data."""
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({
+        "date": pd.date_range("2024-01-01", periods=rows, freq="D").strftime("%Y-%m-%d"),
+        "baseline_kwh": rng.uniform(300, 500, rows).round(1),
+        "actual_kwh": rng.uniform(250, 450, rows).round(1),
+        "efficiency_improvement": rng.uniform(0.1, 0.4, rows).round(2),
+        "site_id": rng.choice(["site-a", "site-b", "site-c"], rows),
+    })
+    if fmt == "csv":
+        return frame.to_csv(index=False).encode("utf-8")
+    if fmt == "json":
+        return frame.to_json(orient="records").encode("utf-8")
+    if fmt == "jsonl":
+        return frame.to_json(orient="records", lines=True).encode("utf-8")
+    raise ValueError(f"No benchmark sample for format: {fmt}")
+
+
+def benchmark_parsers(schema=None, rows: int = 5_000, repeats: int = 3):
+    """
+    Measures parse throughput (MB/s, best of `repeats`) of every available
+    engine on a synthetic sample. Engines that fail are reported as 0.
+    """
+    results = {}
+    for fmt in BENCHMARK_FORMATS:
+        sample = _sample_bytes(fmt, rows)
+        megabytes = len(sample) / 1e6
+        results[fmt] = {}
+        for name, reader in PARSERS[fmt].items():
+            best = None
+            try:
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    reader(sample, schema)
+                    elapsed = time.perf_counter() - start
+                    best = elapsed if best is None else min(best, elapsed)
+                results[fmt][name] = round(megabytes / best, 2)
+            except Exception as e:
+                print(f" Parser {fmt}/{name} failed benchmark: {e}")
+                results[fmt][name] = 0.0
+    return results
+
+
+@lru_cache(maxsize=None)
+def engine_ranking(schema=None):
+    """
+    Engines per format, fastest first. Benchmarked once per process and
+    schema on first use; formats without alternatives keep their single
+    engine.
+    """
+    throughput = benchmark_parsers(schema)
+    ranking = {}
+    for fmt, engines in PARSERS.items():
+        if fmt in throughput:
+            ranking[fmt] = sorted(engines, key=lambda name: -throughput[fmt][name])
+        else:
+            ranking[fmt] = list(engines)
+    return {"ranking": ranking, "throughput_mb_s": throughput}
+
+
+def parse(contents: bytes, fmt: str, schema=None):
+    """
+    Parses contents with the fastest engine for fmt, falling back to the
+    next engine if it rejects the input. Returns (df, engine_name).
+    The first engine's error is raised when every engine fails.
+    """
+    first_error = None
+    for name in engine_ranking(schema)["ranking"][fmt]:
+        try:
+            return PARSERS[fmt][name](contents, schema), name
+        except Exception as e:
+            if first_error is None:
+                first_error = e
+    raise first_error
+
+
+def iter_chunks(contents: bytes, fmt: str, schema=None, chunk_rows: int = CHUNK_ROWS):
+    """
+    Yields DataFrames of at most chunk_rows rows for streaming formats;
+    other formats are parsed whole and yielded as a single frame.
+    """
+    reader = CHUNKED_READERS.get(fmt)
+    if reader is None:
+        yield parse(contents, fmt, schema)[0]
+    else:
+        yield from reader(contents, schema, chunk_rows)
+
+
+def warm_up(schema=None):
+    """Runs the engine benchmark in the background so the first upload does not pay for it."""
+    threading.Thread(target=engine_ranking, args=(schema,), name="parser-benchmark", daemon=True).start()
@@ -0,0 +1,312 @@
+"""
+Data-quality stage for uploads: runs on a compact frame before analysis.
+
+Sorts readings by site and time, drops duplicates, snaps them onto a
+regular interval grid (when the file has one), interpolates short gaps
+and flags meter spikes
+with a rolling median / MAD test. Everything works on flat arrays with
+the sites laid end to end, so cost is a few vectorized passes however
+many sites a file holds.
+"""
+
+import numpy as np
+import pandas as pd
+
+from app.core.constants import QUALITY_MAD_THRESHOLD, QUALITY_MAD_WINDOW, QUALITY_MAX_GAP_STEPS
+from app.data.ingest import CATEGORY_COLUMNS, VALUE_COLUMNS
+
+# Readings checked for spikes; efficiency_improvement is a setting, not a reading
+OUTLIER_COLUMNS = ['baseline_kwh', 'actual_kwh']
+
+_DAY_NS = 24 * 3600 * 10**9
+
+# Steps sampled when inferring the reading interval
+STEP_SAMPLE = 100_000
+
+# Outlier dates listed in the report
+MAX_REPORTED_OUTLIERS = 20
+
+# Standard deviation of normally distributed noise per unit of MAD
+_MAD_TO_SIGMA = 1.4826
+
+# Rolling-mean deviation (in rolling standard deviations) that makes a
+# reading a Hampel test candidate
+PRESCREEN_SIGMAS = 3.0
+
+
+# Share of steps that must be whole multiples of the interval for a file
+# to count as regular (the rest are off-grid readings that get snapped)
+REGULAR_STEP_SHARE = 0.95
+
+
+def _step_ns(times: np.ndarray, site_codes: np.ndarray):
+    """
+    Regular reading interval, or None when readings are irregular (e.g.
+    monthly, whose steps are 28-31 days), taken over the first STEP_SAMPLE
+    steps between consecutive readings of a site.
+
+    The candidates are the shortest step, so a daily file with missing
+    days is still daily, then the most common step, so a few off-grid
+    readings do not break a 15-minute file. The first candidate that
+    REGULAR_STEP_SHARE of all steps are whole multiples of wins.
+    """
+    times, site_codes = times[:STEP_SAMPLE], site_codes[:STEP_SAMPLE]
+    steps = np.diff(times)
+    steps = steps[(steps > 0) & (site_codes[1:] == site_codes[:-1])]
+    if not len(steps):
+        return _DAY_NS
+    values, counts = np.unique(steps, return_counts=True)
+    for candidate in (values[0], values[counts.argmax()]):
+        if (steps % candidate == 0).mean() >= REGULAR_STEP_SHARE:
+            return int(candidate)
+    return None
+
+
+def _sorted_unique_rows(rows: np.ndarray, site_codes: np.ndarray, times: np.ndarray) -> np.ndarray:
+    """
+    rows ordered by (site, timestamp to the second), keeping the last row
+    of the file for each repeated timestamp.
+
+    Site and second are packed into one int64 key, so ordering is a
+    single argsort, skipped altogether for files that are already sorted.
+    """
+    if not len(rows):
+        return rows
+    codes = site_codes[rows].astype(np.int64)
+    seconds = (times[rows] - times[rows].min()) // 10**9
+    span = int(seconds.max()) + 1
+    if (int(codes.max()) + 1) * span < 2**62:
+        key = codes * span + seconds
+        if (key[1:] < key[:-1]).any():
+            sort = np.argsort(key)
+            rows, key = rows[sort], key[sort]
+    else:
+        sort = np.lexsort((seconds, codes))
+        rows, key = rows[sort], np.column_stack([codes, seconds])[sort]
+        key = np.r_[0, np.cumsum((key[1:] != key[:-1]).any(axis=1))]
+
+    starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+    return np.maximum.reduceat(rows, starts) if len(starts) < len(rows) else rows
+
+
+def _interpolate(grid: np.ndarray, observed: np.ndarray, site_start: np.ndarray, site_end: np.ndarray,
+                 max_gap: int) -> np.ndarray:
+    """
+    Linear fill, in place, of runs of at most max_gap unobserved grid rows
+    between two observed rows of the same site. Returns the filled mask.
+    """
+    index = np.arange(len(grid))
+    prev = np.maximum.accumulate(np.where(observed, index, -1))
+    nxt = np.minimum.accumulate(np.where(observed, index, len(grid))[::-1])[::-1]
+    fillable = ~observed & (prev >= site_start) & (nxt < site_end) & (nxt - prev - 1 <= max_gap)
+
+    lo, hi = prev[fillable], nxt[fillable]
+    weight = ((index[fillable] - lo) / (hi - lo))[:, None]
+    grid[fillable] = grid[lo] + (grid[hi] - grid[lo]) * weight
+    return fillable
+
+
+def _hampel(values: np.ndarray, site_start: np.ndarray, site_end: np.ndarray, window: int, threshold: float):
+    """
+    Hampel test per column of values (rows, columns): a reading is an
+    outlier when it is more than threshold robust sigmas (1.4826 x MAD of
+    the window) from the median of the centered window of its own site.
+    Returns (flags, window medians; NaN where not computed).
+
+    Medians are exact but only computed for candidates: readings more
+    than PRESCREEN_SIGMAS rolling standard deviations from the rolling
+    mean (O(n) via cumulative sums). A spike large enough to fail the
+    Hampel test also dominates the window's variance, so this keeps
+    every outlier while leaving well under 1% of rows to sort.
+    """
+    half = window // 2
+    index = np.arange(len(values))
+    lo = np.maximum(index - half, site_start)
+    hi = np.minimum(index + half, site_end - 1) + 1
+    count = (hi - lo).astype(np.float64)
+
+    flags = np.zeros(values.shape, dtype=bool)
+    medians = np.full(values.shape, np.nan)
+    for col in range(values.shape[1]):
+        x = np.ascontiguousarray(values[:, col])
+        # Window sums S1, S2 from cumulative sums; in units of count^2,
+        # (x - mean)^2 > k^2 var  <=>  (c x - S1)^2 > k^2 (c S2 - S1^2)
+        sums = np.r_[0.0, np.cumsum(x)]
+        squares = np.r_[0.0, np.cumsum(x * x)]
+        s1 = sums[hi] - sums[lo]
+        deviation = count * x - s1
+        spread = count * (squares[hi] - squares[lo]) - s1 * s1
+        rows = np.flatnonzero(deviation * deviation > PRESCREEN_SIGMAS ** 2 * spread)
+        if not len(rows):
+            continue
+        # Windows clipped to the site; edge readings repeat at the ends
+        windows = x[np.clip(rows[:, None] + np.arange(-half, half + 1), lo[rows, None], hi[rows, None] - 1)]
+        median = np.median(windows, axis=1)
+        mad = np.median(np.abs(windows - median[:, None]), axis=1)
+        # Flat stretches have zero MAD; require a spike of 1% of the level there
+        scale = np.maximum(_MAD_TO_SIGMA * mad, 0.01 * np.abs(median) / threshold)
+        outlier = np.abs(x[rows] - median) > threshold * np.maximum(scale, 1e-9)
+        flags[rows[outlier], col] = True
+        medians[rows, col] = median
+    return flags, medians
+
+
+def clean_energy_frame(
+    df: pd.DataFrame,
+    max_gap_steps: int = QUALITY_MAX_GAP_STEPS,
+    mad_window: int = QUALITY_MAD_WINDOW,
+    mad_threshold: float = QUALITY_MAD_THRESHOLD,
+    repair_outliers: bool = False,
+):
+    """
+    Cleans a compact upload frame (see app.data.ingest.compact_frame).
+    Returns (clean_df, report).
+
+    - rows with missing dates or non-numeric readings are dropped, and
+      readings with negative kWh are treated as missing
+    - readings are sorted by (site_id, date); repeated timestamps keep
+      the last row of the file
+    - when the file has a regular interval (see _step_ns), each site is
+      resampled to it, starting at its first reading: off-grid readings
+      snap to the slot they fall in, and gaps of up to max_gap_steps
+      slots are linearly interpolated; longer gaps stay missing and
+      produce no rows. Irregular files (e.g. monthly) are not resampled
+    - baseline / actual readings further than mad_threshold robust sigmas
+      from the centered rolling median of mad_window readings are
+      flagged; only with repair_outliers are they replaced by that median
+
+    The report counts every change, so a rebound figure can be traced
+    back to what was repaired.
+    """
+
+    n_input = len(df)
+    times = df['date'].to_numpy().astype("datetime64[ns]").astype(np.int64)
+    values = np.column_stack([df[col].to_numpy(dtype=np.float64) for col in VALUE_COLUMNS])
+
+    valid = ~pd.isna(df['date']).to_numpy() & np.isfinite(values).all(axis=1)
+    kwh = values[:, :2]
+    negative = valid & (kwh < 0).any(axis=1)
+    kwh[kwh < 0] = np.nan
+    efficiency_clipped = int((valid & ((values[:, 2] < 0) | (values[:, 2] > 1))).sum())
+    values[:, 2] = np.clip(values[:, 2], 0.0, 1.0)
+
+    if 'site_id' in df.columns:
+        site_codes = df['site_id'].astype('category').cat.codes.to_numpy()
+        valid &= site_codes >= 0
+    else:
+        site_codes = np.zeros(n_input, dtype=np.int64)
+
+    rows = np.flatnonzero(valid)
+    if not len(rows):
+        # Nothing usable (e.g. header only, or every row invalid): no grid to build
+        empty = df.iloc[:0][['date', *VALUE_COLUMNS, *(col for col in CATEGORY_COLUMNS if col in df.columns)]]
+        return empty.reset_index(drop=True), {
+            "input_rows": n_input,
+            "output_rows": 0,
+            "sites": 0,
+            "interval_minutes": None,
+            "resampled": False,
+            "invalid_rows": n_input,
+            "negative_readings": int(negative.sum()),
+            "efficiency_clipped": efficiency_clipped,
+            "duplicates": 0,
+            "off_grid_readings": 0,
+            "missing_steps": 0,
+            "interpolated_steps": 0,
+            "unfilled_steps": 0,
+            "outliers": {col: 0 for col in OUTLIER_COLUMNS},
+            "outliers_repaired": bool(repair_outliers),
+            "outlier_dates": [],
+        }
+
+    order = _sorted_unique_rows(rows, site_codes, times)
+    duplicates = int(len(rows) - len(order))
+    codes, t = site_codes[order], times[order]
+
+    step = _step_ns(t, codes)
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    site_first = np.repeat(t[starts], np.diff(np.r_[starts, len(order)]))
+    if step is None:
+        # Irregular readings are kept as they are: one slot each, no gap filling
+        slot = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+        off_grid = 0
+    else:
+        slot = (t - site_first) // step
+        off_grid = int(((t - site_first) % step != 0).sum())
+
+        # Several readings snapped into one slot: the last one wins
+        last = np.r_[(codes[1:] != codes[:-1]) | (slot[1:] != slot[:-1]), True]
+        duplicates += int(len(order) - last.sum())
+        order, codes, slot, site_first, t = order[last], codes[last], slot[last], site_first[last], t[last]
+
+    # Full grid: each site's slots 0..last_slot laid end to end
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(order) else np.empty(0, dtype=np.int64)
+    site_slots = slot[np.r_[starts[1:] - 1, len(order) - 1]] + 1 if len(order) else np.empty(0, dtype=np.int64)
+    offsets = np.r_[0, np.cumsum(site_slots)]
+    grid_site = np.repeat(np.arange(len(starts)), site_slots)
+    position = offsets[np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(order)]))] + slot
+    site_start, site_end = offsets[grid_site], offsets[grid_site + 1]
+
+    if step is None:
+        grid_times = t
+    else:
+        # Slot 0 of every site holds its first reading
+        grid_times = site_first[starts][grid_site] + (np.arange(offsets[-1]) - site_start) * step
+
+    grid = np.full((offsets[-1], len(VALUE_COLUMNS)), np.nan)
+    grid[position] = values[order]
+    source = np.full(offsets[-1], -1, dtype=np.int64)
+    source[position] = order
+    # Labels of filled slots come from the site's previous reading
+    label_rows = source[np.maximum.accumulate(np.where(source >= 0, np.arange(offsets[-1]), 0))]
+
+    observed = ~np.isnan(grid).any(axis=1)
+    filled = _interpolate(grid, observed, site_start, site_end, max_gap_steps if step is not None else 0)
+    present = observed | filled
+    missing_steps = int((source < 0).sum())
+
+    grid, filled, grid_site = grid[present], filled[present], grid_site[present]
+    grid_times, label_rows = grid_times[present], label_rows[present]
+
+    bounds = np.flatnonzero(np.r_[True, grid_site[1:] != grid_site[:-1], True])
+    lengths = np.diff(bounds)
+    flags, median = _hampel(
+        grid[:, :2], np.repeat(bounds[:-1], lengths), np.repeat(bounds[1:], lengths), mad_window, mad_threshold
+    )
+    if repair_outliers:
+        grid[:, :2] = np.where(flags, median, grid[:, :2])
+
+    # Straight to the compact schema: float32 readings, categorical labels
+    columns = {'date': grid_times.astype("datetime64[ns]")}
+    for i, col in enumerate(VALUE_COLUMNS):
+        columns[col] = grid[:, i].astype(np.float32)
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            labels = df[col].astype('category')
+            columns[col] = pd.Categorical.from_codes(
+                labels.cat.codes.to_numpy()[label_rows], categories=labels.cat.categories
+            )
+    clean = pd.DataFrame(columns)
+
+    report = {
+        "input_rows": n_input,
+        "output_rows": len(clean),
+        "sites": int(len(starts)),
+        "interval_minutes": round(step / 60e9, 2) if step is not None else None,
+        "resampled": step is not None,
+        "invalid_rows": int(n_input - valid.sum()),
+        "negative_readings": int(negative.sum()),
+        "efficiency_clipped": efficiency_clipped,
+        "duplicates": duplicates,
+        "off_grid_readings": off_grid,
+        "missing_steps": missing_steps,
+        "interpolated_steps": int(filled.sum()),
+        "unfilled_steps": int(len(present) - present.sum()),
+        "outliers": {col: int(flags[:, i].sum()) for i, col in enumerate(OUTLIER_COLUMNS)},
+        "outliers_repaired": bool(repair_outliers),
+        "outlier_dates": [
+            str(date)[:10] if step is None or step >= _DAY_NS else str(date)[:19]
+            for date in columns['date'][flags.any(axis=1)][:MAX_REPORTED_OUTLIERS]
+        ],
+    }
+    return clean, report
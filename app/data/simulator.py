@@ -1,16 +1,36 @@
 import numpy as np
 from app.services.impact_model import calculate_expected_impact
 
-def generate_simulated_data(days: int = 30):
+def generate_simulated_data(
+    days: int = 30,
+    seed: int = None,
+    efficiency_gain: float = 0.3,
+    rebound_factor: float = None,
+):
+    """
+    Generates a simulated baseline / expected / actual emissions series.
+
+    seed:
+        Seeds the generator so the same seed always yields the same series.
+    rebound_factor:
+        Share of the expected savings lost to behavior (0.4 = 40%).
+        When omitted, actual emissions stay at 85% of baseline.
+    """
+
+    rng = np.random.default_rng(seed)
 
     # Baseline emissions
-    baseline = np.random.normal(100, 5, days)
+    baseline = rng.normal(100, 5, days)
 
     # Expected emissions from impact model
-    expected = calculate_expected_impact(baseline, efficiency_gain=0.3)
+    expected = calculate_expected_impact(baseline, efficiency_gain=efficiency_gain)
 
     # Actual emissions (simulate rebound)
-    actual = baseline * 0.85
+    if rebound_factor is None:
+        actual = baseline * 0.85
+    else:
+        lost_savings = (baseline - np.array(expected)) * rebound_factor
+        actual = np.array(expected) + lost_savings * rng.uniform(0.9, 1.1, days)
 
     return {
         "baseline": baseline.tolist(),
@@ -0,0 +1,48 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from app.utils.hashing import fingerprint
+
+
+class DatasetStore:
+    """
+    In-process store of uploaded energy series, keyed by content hash.
+
+    Uploading the same data twice returns the same dataset ID, which also
+    makes the ID a natural cache key for the analysis pipeline.
+    """
+
+    def __init__(self, max_datasets: int = 256):
+        self.max_datasets = max_datasets
+        self._datasets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, series: dict, source: str = "upload"):
+        dataset_id = fingerprint(series)[:16]
+        with self._lock:
+            if dataset_id not in self._datasets:
+                self._datasets[dataset_id] = {
+                    "series": series,
+                    "source": source,
+                    "data_points": len(series["baseline"]),
+                    "stored_at": datetime.now().isoformat()
+                }
+            self._datasets.move_to_end(dataset_id)
+            while len(self._datasets) > self.max_datasets:
+                self._datasets.popitem(last=False)
+        return dataset_id
+
+    def get(self, dataset_id: str):
+        with self._lock:
+            record = self._datasets.get(dataset_id)
+            if record is not None:
+                self._datasets.move_to_end(dataset_id)
+            return record
+
+    def list(self):
+        with self._lock:
+            return [
+                {"dataset_id": dataset_id, **{k: v for k, v in record.items() if k != "series"}}
+                for dataset_id, record in self._datasets.items()
+            ]
@@ -0,0 +1,147 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+FINISHED_STATUSES = (SUCCEEDED, FAILED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id      TEXT PRIMARY KEY,
+    kind        TEXT NOT NULL,
+    tenant_id   TEXT NOT NULL,
+    dedupe_key  TEXT,
+    status      TEXT NOT NULL,
+    progress    REAL NOT NULL DEFAULT 0,
+    message     TEXT,
+    params      TEXT,
+    payload     BLOB,
+    result      BLOB,
+    result_type TEXT,
+    error       TEXT,
+    version     INTEGER NOT NULL DEFAULT 0,
+    created_at  REAL NOT NULL,
+    updated_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+CREATE INDEX IF NOT EXISTS jobs_dedupe ON jobs (tenant_id, dedupe_key);
+"""
+
+# Columns returned by get(); payload and result blobs are fetched separately
+_SUMMARY_COLUMNS = (
+    "job_id", "kind", "tenant_id", "status", "progress", "message",
+    "params", "result_type", "error", "version", "created_at", "updated_at"
+)
+
+
+class JobStore:
+    """
+    SQLite-backed record of background jobs.
+
+    Inputs and results are stored with the job, so pointing path at a
+    file lets queued work survive a restart. The default ":memory:"
+    keeps everything in-process.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+
+    def create(self, kind: str, tenant_id: str, params: dict = None, payload: bytes = None, dedupe_key: str = None):
+        """
+        Inserts a queued job and returns (job_id, created). When dedupe_key
+        matches an unfinished job of the same tenant, that job is returned.
+        """
+        now = time.time()
+        with self._lock:
+            if dedupe_key is not None:
+                row = self._conn.execute(
+                    "SELECT job_id FROM jobs WHERE tenant_id = ? AND dedupe_key = ? AND status IN (?, ?)",
+                    (tenant_id, dedupe_key, QUEUED, RUNNING),
+                ).fetchone()
+                if row is not None:
+                    return row["job_id"], False
+
+            job_id = uuid.uuid4().hex
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, kind, tenant_id, dedupe_key, status, params, payload, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, tenant_id, dedupe_key, QUEUED, json.dumps(params or {}), payload, now, now),
+            )
+        return job_id, True
+
+    def update(self, job_id: str, **fields):
+        """Sets the given columns and bumps the job's version."""
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE jobs SET {columns}, version = version + 1, updated_at = ? WHERE job_id = ?",
+                (*fields.values(), time.time(), job_id),
+            )
+
+    def get(self, job_id: str):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(_SUMMARY_COLUMNS)} FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["params"] = json.loads(job["params"] or "{}")
+        return job
+
+    def payload(self, job_id: str):
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return row["payload"] if row else None
+
+    def result(self, job_id: str):
+        """Returns (result_type, result) of a finished job."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result_type, result FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return (row["result_type"], row["result"]) if row else (None, None)
+
+    def list(self, tenant_id: str, limit: int = 50):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT job_id, kind, status, progress, created_at, updated_at FROM jobs"
+                " WHERE tenant_id = ? ORDER BY created_at DESC LIMIT ?",
+                (tenant_id, limit),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def requeue_interrupted(self):
+        """Marks jobs left running by a previous process as queued; returns all queued IDs."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, progress = 0, message = 'Requeued after restart',"
+                " version = version + 1 WHERE status = ?",
+                (QUEUED, RUNNING),
+            )
+            rows = self._conn.execute(
+                "SELECT job_id FROM jobs WHERE status = ? ORDER BY created_at", (QUEUED,)
+            ).fetchall()
+        return [row["job_id"] for row in rows]
+
+    def purge_finished(self, older_than: float):
+        """Deletes finished jobs last updated more than older_than seconds ago."""
+        cutoff = time.time() - older_than
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?", (*FINISHED_STATUSES, cutoff)
+            )
+        return cursor.rowcount
@@ -0,0 +1,108 @@
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from app.core.config import ENV_PREFIX, get_settings
+
+SUFFIX = ".pdf"
+
+
+class ReportCache:
+    """
+    Rendered PDF reports on disk, named by the fingerprint (SHA-256 of the
+    canonical JSON) of the payload they were rendered from, so an
+    identical export is a file lookup instead of a render.
+
+    An in-memory index keeps entries in least-recently-used order with
+    their sizes; writes evict the oldest files until the directory is back
+    under max_bytes. The index is rebuilt from file mtimes on start (hits
+    touch the file), so a restart keeps both the files and their order.
+    Files are written to a temporary name and renamed into place, so a
+    reader never sees a partial PDF.
+    """
+
+    def __init__(self, directory, max_bytes: int):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        existing = []
+        for path in self.directory.glob("*" + SUFFIX):
+            stat = path.stat()
+            existing.append((stat.st_mtime, path.stem, stat.st_size))
+        for _, key, size in sorted(existing):
+            self._entries[key] = size
+            self._bytes += size
+        with self._lock:
+            self._evict()
+
+    def path(self, key: str) -> Path:
+        return self.directory / f"{key}{SUFFIX}"
+
+    def get(self, key: str):
+        """Path of the cached report for key, or None."""
+        path = self.path(key)
+        with self._lock:
+            size = self._entries.get(key)
+            if size is not None and not path.is_file():
+                # Removed outside this process (e.g. another worker's eviction)
+                del self._entries[key]
+                self._bytes -= size
+                size = None
+            if size is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        os.utime(path)
+        return path
+
+    def put(self, key: str, content: bytes) -> Path:
+        """Stores a rendered report and returns its path."""
+        path = self.path(key)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(content)
+        os.replace(tmp, path)
+
+        with self._lock:
+            self._bytes -= self._entries.pop(key, 0)
+            self._entries[key] = len(content)
+            self._bytes += len(content)
+            self._evict(keep=key)
+        return path
+
+    def _evict(self, keep: str = None):
+        while self._bytes > self.max_bytes and self._entries:
+            key, size = next(iter(self._entries.items()))
+            if key == keep:
+                # The newest report alone is over budget: keep it until the next write
+                break
+            del self._entries[key]
+            self._bytes -= size
+            self.path(key).unlink(missing_ok=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+def _create_report_cache():
+    # Set GREENGAP_REPORT_CACHE_DIR to share rendered reports across restarts / workers
+    directory = os.getenv(ENV_PREFIX + "REPORT_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "greengap-reports")
+    return ReportCache(directory, max_bytes=get_settings().report_cache_bytes)
+
+
+report_cache = _create_report_cache()
@@ -0,0 +1,186 @@
+import threading
+
+import numpy as np
+
+from app.services.site_stats import SUM_FIELDS, summary_metrics
+
+# Hierarchy levels, leaf first
+LEVELS = ("site", "group", "region", "portfolio")
+
+PORTFOLIO = "portfolio"
+UNASSIGNED_GROUP = "ungrouped"
+UNASSIGNED_REGION = "unassigned"
+
+
+def unassigned_group(region: str) -> str:
+    """Group name for a region's sites without a group (a group has one region)."""
+    return f"{UNASSIGNED_GROUP}/{region}"
+
+
+def _is_unassigned_group(group: str) -> bool:
+    return group.startswith(UNASSIGNED_GROUP + "/")
+
+# Node totals vector: SUM_FIELDS followed by the day count
+_ROWS = len(SUM_FIELDS)
+
+
+class RollupTree:
+    """
+    Site -> building group -> region -> portfolio aggregates.
+
+    Every node keeps the same running sums SiteStats does (SUM_FIELDS plus
+    a day count) as one float64 vector. A site append adds its delta to
+    the site and each ancestor, and moving a site subtracts its vector
+    from the old path and adds it to the new one, so updates cost
+    O(depth) and any node's metrics are O(1). Drill-down follows child
+    links, never raw readings.
+
+    Nodes are (level, name) pairs; group names are unique per tenant and
+    a group belongs to one region at a time. Sites without a group sit in
+    their region's own unassigned group ("ungrouped/<region>").
+    """
+
+    def __init__(self):
+        self._totals = {(PORTFOLIO, PORTFOLIO): np.zeros(_ROWS + 1)}
+        self._parent = {}
+        self._children = {(PORTFOLIO, PORTFOLIO): set()}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._totals)
+
+    def _path(self, node):
+        while node is not None:
+            yield node
+            node = self._parent.get(node)
+
+    def _attach(self, node, parent):
+        self._totals.setdefault(node, np.zeros(_ROWS + 1))
+        self._children.setdefault(node, set())
+        self._parent[node] = parent
+        self._children[parent].add(node)
+
+    def _detach(self, node):
+        """Unlinks node from its parent, pruning ancestors left without children."""
+        parent = self._parent.pop(node)
+        self._children[parent].discard(node)
+        if parent[0] != PORTFOLIO and not self._children[parent]:
+            del self._totals[parent], self._children[parent]
+            self._detach(parent)
+
+    def place(self, site_id: str, group: str = None, region: str = None):
+        """
+        Puts a site under group / region, moving its totals if it was
+        elsewhere. Unset values keep the current placement (or the
+        unassigned defaults for a new site); an ungrouped site that moves
+        region joins the new region's unassigned group. Raises ValueError
+        when the group already belongs to another region.
+        """
+
+        site = ("site", site_id)
+        with self._lock:
+            current = self._parent.get(site)
+            if current is not None:
+                if not group and not _is_unassigned_group(current[1]):
+                    group = current[1]
+                region = region or self._parent[current][1]
+            region_node = ("region", region or UNASSIGNED_REGION)
+            group_node = ("group", group or unassigned_group(region_node[1]))
+
+            group_region = self._parent.get(group_node)
+            if group_region is not None and group_region != region_node and \
+                    self._children[group_node] != {site}:
+                raise ValueError(
+                    f"Group '{group_node[1]}' belongs to region '{group_region[1]}', not '{region_node[1]}'"
+                )
+
+            if current == group_node and group_region == region_node:
+                return
+            totals = self._totals.get(site)
+            if current is not None:
+                for node in self._path(current):
+                    self._totals[node] -= totals
+                # A group whose only member moves is pruned, so it follows the site
+                self._detach(site)
+
+            if region_node not in self._parent:
+                self._attach(region_node, (PORTFOLIO, PORTFOLIO))
+            if group_node not in self._parent:
+                self._attach(group_node, region_node)
+            self._attach(site, group_node)
+            if totals is not None:
+                for node in self._path(group_node):
+                    self._totals[node] += totals
+
+    def remove(self, site_id: str):
+        """Takes a site and its totals out of the tree; unknown sites are ignored."""
+
+        site = ("site", site_id)
+        with self._lock:
+            if site not in self._parent:
+                return
+            totals = self._totals.pop(site)
+            for node in self._path(self._parent[site]):
+                self._totals[node] -= totals
+            self._detach(site)
+            del self._children[site]
+
+    def add(self, site_id: str, delta: dict, rows: int):
+        """Adds a site's change in SUM_FIELDS totals and day count to the site and its ancestors."""
+
+        vector = np.array([delta[name] for name in SUM_FIELDS] + [rows], dtype=np.float64)
+        site = ("site", site_id)
+        with self._lock:
+            if site not in self._parent:
+                raise KeyError(site_id)
+            for node in self._path(site):
+                self._totals[node] += vector
+
+    def placement(self, site_id: str):
+        """(group, region) a site sits under, or None if it is not in the tree."""
+        with self._lock:
+            group = self._parent.get(("site", site_id))
+            return None if group is None else (group[1], self._parent[group][1])
+
+    def node(self, level: str, name: str, settings, depth: int = 1):
+        """
+        Metrics for one node plus its descendants down `depth` levels,
+        or None for an unknown node.
+        """
+
+        with self._lock:
+            key = (level, name)
+            if key not in self._totals:
+                return None
+            return self._describe(key, settings, depth)
+
+    def _describe(self, node, settings, depth: int) -> dict:
+        vector = self._totals[node]
+        rows = int(vector[_ROWS])
+        out = {
+            "level": node[0],
+            "name": node[1],
+            "data_points": rows,
+            **summary_metrics(dict(zip(SUM_FIELDS, vector[:_ROWS].tolist())), rows, settings),
+        }
+        if node[0] != "site":
+            children = sorted(self._children[node])
+            out["children_count"] = len(children)
+            if depth > 0:
+                out["children"] = [self._describe(child, settings, depth - 1) for child in children]
+        return out
+
+    def sites(self, level: str, name: str):
+        """Site ids under a node, or None for an unknown node."""
+        with self._lock:
+            key = (level, name)
+            if key not in self._totals:
+                return None
+            found, stack = [], [key]
+            while stack:
+                node = stack.pop()
+                if node[0] == "site":
+                    found.append(node[1])
+                else:
+                    stack.extend(self._children[node])
+            return sorted(found)
@@ -0,0 +1,45 @@
+import threading
+from collections import OrderedDict
+
+from app.services.site_stats import SiteStats
+
+
+class SiteStatsStore:
+    """
+    In-process running statistics per site, for incremental appends.
+    Least recently used sites are dropped beyond max_sites.
+    """
+
+    def __init__(self, window_days: int, max_sites: int = 10_000):
+        self.window_days = window_days
+        self.max_sites = max_sites
+        self._sites = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, site_id: str, create: bool = False):
+        with self._lock:
+            stats = self._sites.get(site_id)
+            if stats is None and create:
+                stats = self._sites[site_id] = SiteStats(self.window_days)
+                while len(self._sites) > self.max_sites:
+                    self._sites.popitem(last=False)
+            if stats is not None:
+                self._sites.move_to_end(site_id)
+            return stats
+
+    def discard(self, site_id: str, stats: SiteStats):
+        """Drops a site that never received rows, unless it has been replaced or filled since."""
+        with self._lock:
+            if self._sites.get(site_id) is stats and stats.rows == 0:
+                del self._sites[site_id]
+
+    def list(self):
+        with self._lock:
+            return [
+                {
+                    "site_id": site_id,
+                    "data_points": stats.rows,
+                    "last_date": stats.last_date.strftime("%Y-%m-%d") if stats.last_date is not None else None
+                }
+                for site_id, stats in self._sites.items()
+            ]
@@ -0,0 +1,149 @@
+import math
+from typing import Dict, List, Literal, Optional
+
+from pydantic import BaseModel, Field, model_validator
+
+from app.core import constants
+
+
+class EnergySeries(BaseModel):
+    """Daily baseline / expected / actual consumption for one site."""
+
+    labels: Optional[List[str]] = None
+    baseline: List[float] = Field(..., min_length=1)
+    expected: Optional[List[float]] = None
+    actual: List[float] = Field(..., min_length=1)
+    efficiency_gain: Optional[float] = Field(None, ge=0, lt=1)
+
+    @model_validator(mode="after")
+    def check_series(self):
+        if self.expected is None:
+            if self.efficiency_gain is None:
+                raise ValueError("Provide either 'expected' or 'efficiency_gain'")
+            self.expected = [b * (1 - self.efficiency_gain) for b in self.baseline]
+
+        lengths = {len(self.baseline), len(self.expected), len(self.actual)}
+        if self.labels is not None:
+            lengths.add(len(self.labels))
+        if len(lengths) != 1:
+            raise ValueError("All series must have the same length")
+
+        for name in ("baseline", "expected", "actual"):
+            if not all(math.isfinite(v) for v in getattr(self, name)):
+                raise ValueError(f"'{name}' contains NaN or infinite values")
+
+        return self
+
+
+class RecommendationSettings(BaseModel):
+    high_threshold: float = Field(constants.REBOUND_INDEX_THRESHOLDS[1], ge=0)
+    medium_threshold: float = Field(constants.REBOUND_INDEX_THRESHOLDS[0], ge=0)
+    projection_blend: float = Field(constants.PROJECTION_BLEND, ge=0, le=1)
+
+    @model_validator(mode="after")
+    def check_order(self):
+        if self.medium_threshold > self.high_threshold:
+            raise ValueError("medium_threshold must not exceed high_threshold")
+        return self
+
+
+class AnalysisRequest(BaseModel):
+    """Body of POST /v1/analyze: inline series or a stored dataset ID."""
+
+    series: Optional[EnergySeries] = None
+    dataset_id: Optional[str] = None
+    recommendation_settings: RecommendationSettings = RecommendationSettings()
+    reduction_factor: float = Field(0.1, ge=0, le=1)
+    uncertainty_samples: int = Field(0, ge=0, le=1_000_000)
+
+    @model_validator(mode="after")
+    def check_source(self):
+        if (self.series is None) == (self.dataset_id is None):
+            raise ValueError("Provide exactly one of 'series' or 'dataset_id'")
+        return self
+
+
+class ParameterRange(BaseModel):
+    """Inclusive range expanded with numpy.linspace, or explicit values."""
+
+    start: Optional[float] = None
+    stop: Optional[float] = None
+    num: int = Field(11, ge=1, le=1000)
+    values: Optional[List[float]] = None
+
+    @model_validator(mode="after")
+    def check_range(self):
+        if self.values is None and (self.start is None or self.stop is None):
+            raise ValueError("Provide 'values' or both 'start' and 'stop'")
+        return self
+
+    def spec(self):
+        if self.values is not None:
+            return self.values
+        return {"start": self.start, "stop": self.stop, "num": self.num}
+
+
+class SiteAverages(BaseModel):
+    site_id: Optional[str] = None
+    baseline_avg: float
+    actual_avg: float
+
+
+class ScenarioSweepRequest(BaseModel):
+    """Body of POST /v1/scenarios/sweep."""
+
+    sites: List[SiteAverages] = []
+    dataset_ids: List[str] = []
+    reduction_factors: ParameterRange = ParameterRange(start=0.0, stop=0.3, num=7)
+    efficiency_gains: ParameterRange = ParameterRange(values=[0.0])
+    rebound_assumptions: ParameterRange = ParameterRange(values=[0.0])
+    reduction_cost: float = Field(1.0, ge=0)
+    efficiency_cost: float = Field(1.0, ge=0)
+    rebound_aggregate: Literal["mean", "worst"] = "mean"
+    include_site_cube: bool = False
+
+    @model_validator(mode="after")
+    def check_sites(self):
+        if not self.sites and not self.dataset_ids:
+            raise ValueError("Provide at least one site or dataset_id")
+        return self
+
+
+class SiteSeries(EnergySeries):
+    site_id: Optional[str] = None
+
+
+class ChangepointRequest(BaseModel):
+    """Body of POST /v1/changepoints: inline site series and/or stored datasets."""
+
+    sites: List[SiteSeries] = []
+    dataset_ids: List[str] = []
+    method: Literal["cusum", "page_hinkley", "binseg"] = "cusum"
+    warmup_days: int = Field(constants.CHANGEPOINT_WARMUP_DAYS, ge=2)
+    drift: Optional[float] = Field(None, ge=0)
+    threshold: Optional[float] = Field(None, gt=0)
+    max_changepoints: int = Field(constants.CHANGEPOINT_MAX_CHANGEPOINTS, ge=1, le=50)
+    min_segment_days: int = Field(constants.CHANGEPOINT_MIN_SEGMENT_DAYS, ge=1)
+    penalty_factor: float = Field(constants.CHANGEPOINT_PENALTY_FACTOR, gt=0)
+
+    @model_validator(mode="after")
+    def check_sites(self):
+        if not self.sites and not self.dataset_ids:
+            raise ValueError("Provide at least one site or dataset_id")
+        return self
+
+
+class QuantileSketchData(BaseModel):
+    k: int = Field(..., ge=2)
+    n: int = Field(..., ge=0)
+    sum: float
+    levels: List[List[float]]
+
+
+class BenchmarkSketches(BaseModel):
+    """Body of POST /v1/benchmarks/sketches: another worker's FleetBenchmark.export()."""
+
+    worker_id: str = Field(..., min_length=1, max_length=128)
+    sites: int = 0
+    # metric -> peer group ("" = whole fleet) -> sketch
+    sketches: Dict[str, Dict[str, QuantileSketchData]]
@@ -0,0 +1,124 @@
+from app.core.config import get_settings
+from app.services.behavior_analyzer import analyze_behavior
+from app.services.dashboard_formatter import format_dashboard_response
+from app.services.forecast_engine import consumption_forecast, fit_consumption, forecast_summary
+from app.services.metrics_engine import calculate_climate_metrics
+from app.services.pipeline_cache import stage_cache
+from app.services.rebound_detector import detect_rebound
+from app.services.recommendation_engine import generate_recommendations
+from app.services.scenario_engine import simulate_scenario
+from app.services.uncertainty_engine import monte_carlo_bands
+from app.utils.hashing import fingerprint
+
+
+def _series(data: dict):
+    return {key: data[key] for key in ("baseline", "expected", "actual")}
+
+
+def cached_rebound(data: dict, cache=stage_cache, settings=None):
+    """Returns detect_rebound(data), sharing the pipeline's rebound cache entry"""
+    series = _series(data)
+    value, _ = cache.get_or_compute(
+        ("rebound", fingerprint(series)), lambda: detect_rebound(series, settings)
+    )
+    return value
+
+
+def forecast_series(data: dict, horizon: int):
+    """Holt-Winters forecast of expected vs actual consumption for one series"""
+    state = fit_consumption(data["expected"], data["actual"])
+    return forecast_summary(consumption_forecast(state, horizon))
+
+
+def run_analysis_pipeline(
+    data: dict,
+    recommendation_settings: dict = None,
+    reduction_factor: float = 0.1,
+    n_samples: int = 0,
+    cache=stage_cache,
+    settings=None,
+):
+    """
+    Runs detect_rebound -> analyze_behavior -> forecast -> generate_recommendations ->
+    calculate_climate_metrics -> format_dashboard_response -> simulate_scenario.
+
+    Each stage is memoized on the hash of its inputs. Downstream keys are
+    built from the data hash plus only the settings that stage reads, so
+    changing recommendation settings reuses the rebound, behavior and
+    metrics results.
+
+    n_samples > 0 adds bootstrap percentile bands (see uncertainty_engine).
+    """
+
+    settings = settings or get_settings()
+    recommendation_settings = recommendation_settings or {}
+    series = _series(data)
+    data_key = fingerprint(series)
+    settings_key = fingerprint(recommendation_settings)
+    cache_hits = {}
+
+    def stage(name, key, compute):
+        value, hit = cache.get_or_compute((name,) + key, compute)
+        cache_hits[name] = hit
+        return value
+
+    rebound_result = stage("rebound", (data_key,), lambda: detect_rebound(series, settings))
+    behavior_result = stage("behavior", (data_key,), lambda: analyze_behavior(series))
+
+    horizon = settings.forecast_horizon_days
+    forecast_result = stage("forecast", (data_key, horizon), lambda: forecast_series(series, horizon))
+
+    recommendation_result = stage(
+        "recommendations",
+        (data_key, settings_key, horizon),
+        lambda: generate_recommendations(
+            rebound_result, behavior_result, settings=settings,
+            forecast_result=forecast_result, **recommendation_settings
+        ),
+    )
+
+    metrics_result = stage(
+        "metrics",
+        (data_key,),
+        lambda: calculate_climate_metrics(rebound_result, behavior_result, settings),
+    )
+
+    dashboard = stage(
+        "dashboard",
+        (data_key, settings_key, horizon),
+        lambda: format_dashboard_response(
+            rebound_result, behavior_result, recommendation_result, metrics_result
+        ),
+    )
+
+    scenario_result = stage(
+        "scenario",
+        (data_key, float(reduction_factor)),
+        lambda: simulate_scenario(rebound_result, reduction_factor=reduction_factor),
+    )
+
+    uncertainty = None
+    if n_samples:
+        blend = recommendation_settings.get("projection_blend", settings.projection_blend)
+        uncertainty = stage(
+            "uncertainty",
+            (data_key, int(n_samples), float(blend)),
+            lambda: monte_carlo_bands(
+                series["baseline"], series["expected"], series["actual"],
+                n_samples=n_samples, projection_blend=blend, seed=int(data_key[:8], 16),
+            ),
+        )
+
+    # Cached stage results are shared, so attach real date labels to a copy
+    if data.get("labels"):
+        dashboard = dict(dashboard)
+        dashboard["emissions_chart"] = {**dashboard["emissions_chart"], "labels": list(data["labels"])}
+
+    return {
+        "dashboard": dashboard,
+        "scenario_projection": scenario_result,
+        "forecast": forecast_result,
+        "uncertainty": uncertainty,
+        "data_hash": data_key,
+        "cache_hits": cache_hits
+    }
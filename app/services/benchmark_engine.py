@@ -0,0 +1,214 @@
+import os
+import threading
+
+import numpy as np
+
+from app.utils.quantile_sketch import KLLSketch
+
+# Metrics every analyzed site is ranked on, and which direction is better
+METRICS = ("sustainability_index", "rebound_percentage", "efficiency_score")
+HIGHER_IS_BETTER = {"sustainability_index": True, "rebound_percentage": False, "efficiency_score": True}
+
+# Peer group key covering every site
+FLEET = ""
+
+QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+# Remote workers kept at once; the one that exported least recently goes first
+MAX_REMOTE_WORKERS = 64
+
+
+def _sorted_quantile(values: np.ndarray, q: float) -> float:
+    """Linearly interpolated quantile of an already sorted array, O(1)."""
+    pos = q * (len(values) - 1)
+    lo = int(pos)
+    hi = min(lo + 1, len(values) - 1)
+    return float(values[lo] + (values[hi] - values[lo]) * (pos - lo))
+
+
+class FleetBenchmark:
+    """
+    Latest metrics of every analyzed site, for "how does my site compare?".
+
+    For each metric and peer group (plus the whole fleet) the values sit
+    in a sorted array with a running sum, so re-recording a site is a
+    delete and an insert at np.searchsorted positions, a percentile rank
+    is two binary searches and peer statistics are O(1) index reads.
+
+    Other worker processes contribute KLL sketches of their own sites
+    (export() / merge()); each worker's latest sketches replace its
+    earlier ones. Once any are merged, ranks add the sketches' weighted
+    ranks to the exact local counts and peer quantiles come from a merged
+    sketch, rebuilt only after a change. At most max_remote_workers are
+    kept (the one that exported least recently goes first), so a flood of
+    bogus worker ids cannot grow the merged state without bound.
+    """
+
+    def __init__(
+        self,
+        worker_id: str = None,
+        max_remote_workers: int = MAX_REMOTE_WORKERS,
+    ):
+        self.worker_id = worker_id or str(os.getpid())
+        self.max_remote_workers = max_remote_workers
+        self._sites = {}
+        self._values = {}
+        self._sums = {}
+        self._remote = {}
+        self._combined = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sites)
+
+    def _insert(self, key, value: float):
+        values = self._values.get(key, np.empty(0))
+        self._values[key] = np.insert(values, np.searchsorted(values, value), value)
+        self._sums[key] = self._sums.get(key, 0.0) + value
+        self._combined.pop(key, None)
+
+    def _remove(self, key, value: float):
+        values = self._values[key]
+        if len(values) == 1:
+            del self._values[key], self._sums[key]
+        else:
+            self._values[key] = np.delete(values, np.searchsorted(values, value))
+            self._sums[key] -= value
+        self._combined.pop(key, None)
+
+    def record(self, site_id: str, metrics: dict, peer_group: str = None):
+        """Stores a site's latest metrics (replacing earlier ones) under its peer group."""
+
+        values = {metric: float(metrics[metric]) for metric in METRICS}
+        peer_group = peer_group or FLEET
+        with self._lock:
+            previous = self._sites.get(site_id)
+            if previous is not None:
+                old_group, old_values = previous
+                for metric, value in old_values.items():
+                    self._remove((metric, FLEET), value)
+                    if old_group != FLEET:
+                        self._remove((metric, old_group), value)
+            for metric, value in values.items():
+                self._insert((metric, FLEET), value)
+                if peer_group != FLEET:
+                    self._insert((metric, peer_group), value)
+            self._sites[site_id] = (peer_group, values)
+
+    def _remote_sketches(self, key):
+        return [sketches[key] for sketches in self._remote.values() if key in sketches]
+
+    def _percentile(self, key, value: float):
+        values = self._values.get(key, np.empty(0))
+        below = np.searchsorted(values, value, side="left")
+        through = np.searchsorted(values, value, side="right")
+        count, rank = len(values), (below + through) / 2
+        for sketch in self._remote_sketches(key):
+            count += sketch.n
+            rank += sketch.rank(value) * sketch.n
+        return (float(rank / count * 100), count) if count else (None, 0)
+
+    def percentile(self, metric: str, value: float, peer_group: str = None) -> dict:
+        """
+        Percentile rank of a value among recorded sites (ties count half)
+        and the share of peers it does better than.
+        """
+
+        with self._lock:
+            rank, count = self._percentile((metric, peer_group or FLEET), value)
+        if rank is None:
+            return {"percentile": None, "better_than": None, "peers": 0}
+        return {
+            "percentile": round(rank, 1),
+            "better_than": round(rank if HIGHER_IS_BETTER[metric] else 100 - rank, 1),
+            "peers": count,
+        }
+
+    def _merged_sketch(self, key) -> KLLSketch:
+        sketch = self._combined.get(key)
+        if sketch is None:
+            sketch = KLLSketch()
+            sketch.add(self._values.get(key, np.empty(0)))
+            for remote in self._remote_sketches(key):
+                sketch.merge(remote)
+            self._combined[key] = sketch
+        return sketch
+
+    def peer_stats(self, metric: str, peer_group: str = None) -> dict:
+        """Count, mean, min / max and quartiles of a metric in a peer group (or the fleet)."""
+
+        key = (metric, peer_group or FLEET)
+        with self._lock:
+            values = self._values.get(key, np.empty(0))
+            if not self._remote_sketches(key):
+                if not len(values):
+                    return {"count": 0}
+                quantiles = [_sorted_quantile(values, q) for q in QUANTILES]
+                return {
+                    "count": len(values),
+                    "mean": round(self._sums[key] / len(values), 2),
+                    "min": round(float(values[0]), 2),
+                    "max": round(float(values[-1]), 2),
+                    **{f"p{int(q * 100)}": round(v, 2) for q, v in zip(QUANTILES, quantiles)},
+                }
+
+            sketch = self._merged_sketch(key)
+            return {
+                "count": sketch.n,
+                "mean": round(sketch.mean(), 2),
+                "min": round(sketch.quantile(0.0), 2),
+                "max": round(sketch.quantile(1.0), 2),
+                **{f"p{int(q * 100)}": round(sketch.quantile(q), 2) for q in QUANTILES},
+            }
+
+    def site_report(self, site_id: str):
+        """A recorded site's metrics ranked in the fleet and its peer group; None if unknown."""
+
+        with self._lock:
+            entry = self._sites.get(site_id)
+        if entry is None:
+            return None
+        peer_group, values = entry
+        report = {"site_id": site_id, "peer_group": peer_group or None, "metrics": {}}
+        for metric, value in values.items():
+            report["metrics"][metric] = {
+                "value": round(value, 2),
+                "fleet": self.percentile(metric, value),
+                "peer_group": self.percentile(metric, value, peer_group) if peer_group else None,
+                "peer_stats": self.peer_stats(metric, peer_group),
+            }
+        return report
+
+    def export(self) -> dict:
+        """This worker's sites as serialized KLL sketches, for merge() in other workers."""
+
+        with self._lock:
+            sketches = {}
+            for (metric, peer_group), values in self._values.items():
+                sketch = KLLSketch()
+                sketch.add(values)
+                sketches.setdefault(metric, {})[peer_group] = sketch.to_dict()
+        return {"worker_id": self.worker_id, "sites": len(self._sites), "sketches": sketches}
+
+    def merge(self, payload: dict):
+        """Takes another worker's export(), replacing anything it sent before."""
+
+        worker_id = str(payload["worker_id"])
+        if worker_id == self.worker_id:
+            return
+        sketches = {
+            (metric, peer_group): KLLSketch.from_dict(data)
+            for metric, groups in payload["sketches"].items() if metric in METRICS
+            for peer_group, data in groups.items()
+        }
+        with self._lock:
+            # Re-inserted last, so the dict stays ordered by export time
+            self._remote.pop(worker_id, None)
+            while len(self._remote) >= self.max_remote_workers:
+                del self._remote[next(iter(self._remote))]
+            self._remote[worker_id] = sketches
+            self._combined.clear()
+
+    def workers(self):
+        with self._lock:
+            return [self.worker_id] + sorted(self._remote)
@@ -0,0 +1,250 @@
+import re
+
+from app.core.constants import CHAT_CONTEXT_TOKENS
+from app.services.prompt_builder import estimate_tokens, pack_context
+
+DEFAULT_LANGUAGE = "English"
+
+# Language names for Gemini
+LANGUAGE_NAMES = {
+    'en': 'English',
+    'es': 'Spanish',
+    'fr': 'French',
+    'de': 'German',
+    'zh': 'Chinese',
+    'hi': 'Hindi',
+    'ar': 'Arabic',
+    'pt': 'Portuguese'
+}
+
+# Pre-defined responses (fallback), in match priority order
+FALLBACK_RESPONSES = {
+    "rebound": """The rebound effect is a critical challenge in sustainability initiatives. It occurs when energy efficiency improvements paradoxically lead to increased consumption, offsetting 30-80% of expected savings.
+
+Here's how it works: When you install energy-efficient LED lights, they use less electricity per hour. However, because they're cheaper to run, people tend to leave them on longer or use more lights.
+
+To prevent rebound effects:
+1. **Implement Automated Schedules**: Set timers and smart controls to limit usage during peak hours
+2. **Monitor Consumption Weekly**: Track your actual usage patterns, not just efficiency metrics
+3. **Set Usage Caps**: Establish maximum consumption targets
+4. **User Education**: Make your team aware of rebound effects
+5. **Regular Audits**: Review consumption data monthly
+
+The key is to maintain behavioral discipline even as technology improves efficiency.""",
+
+    "efficiency": """Improving energy efficiency requires a holistic approach:
+
+**1. HVAC Optimization (30-40% of energy use)**
+- Schedule heating/cooling during off-peak hours (9 PM - 6 AM)
+- Set thermostats to 68°F in winter, 76°F in summer
+- Use programmable thermostats with occupancy sensors
+
+**2. Lighting Strategies (15-20%)**
+- Maximize natural daylight
+- Install LED bulbs (75% more efficient)
+- Use motion sensors in low-traffic areas
+
+**3. Power Management (10-15%)**
+- Enable power-saving modes on all devices
+- Use smart power strips to eliminate standby consumption
+- Shut down computers completely at night
+
+**Expected Results**: These strategies typically reduce consumption by 25-45% within 3-6 months.""",
+
+    "carbon": """Reducing your carbon footprint requires action across multiple areas:
+
+**Immediate Actions**
+1. **Switch to Renewable Energy**: 40-60% footprint reduction
+2. **Energy Audit**: Identify biggest consumption sources
+
+**Short-Term Investments**
+3. **Solar Panel Installation**: 6-8 year ROI, 25-year lifespan
+4. **Energy Storage Systems**: Battery backup for solar power
+
+**Ongoing Practices**
+5. **Carbon Offset Programs**: $10-30 per ton of CO₂
+6. **Transportation Changes**: Reduce travel by 30%, consider EVs
+
+Use GreenGap to monitor your CO₂ reduction over time.""",
+
+    "peak": """Peak hour optimization saves costs and helps grid stability:
+
+**Understanding Peak Hours**
+- Morning: 6-9 AM, Evening: 5-9 PM
+- Electricity costs 2-5x more during peaks
+
+**Optimization Strategies**
+1. **Load Shifting**: Run appliances after 9 PM (30-50% savings)
+2. **Battery Storage**: Charge off-peak, discharge during peak
+3. **Automated Demand Response**: Smart thermostats adjust automatically
+
+**Expected Impact**: 25-45% reduction, saving $5,000-50,000 annually for businesses.""",
+
+    "behavior": """Improving your sustainability behavior score:
+
+**Understanding Score (0-100)**
+- Consistency of practices (40%)
+- Adherence to schedules (25%)
+- Response to alerts (20%)
+- Engagement with recommendations (15%)
+
+**Improvement Strategies**
+1. **Gamification**: Team leaderboards, competitions
+2. **Real-Time Feedback**: Daily updates, instant alerts
+3. **Incentive Programs**: Financial bonuses, recognition
+4. **Team Challenges**: Department competitions, hackathons
+
+**Expected Timeline**: 10-15 point improvement in 3 months."""
+}
+
+DEFAULT_ANSWER = """I'm your GreenGap AI sustainability assistant, powered by Pathway and Google Gemini. I can provide detailed guidance on:
+
+**Rebound Effects**: Why efficiency improvements increase consumption (30-80% offset)
+**Energy Efficiency**: HVAC, lighting, power optimization (25-45% reduction)
+**Carbon Reduction**: Renewable energy, solar, offsets
+**Peak Hour Optimization**: Load shifting, storage (20-40% cost savings)
+**Behavior Improvement**: Gamification, incentives, challenges
+
+**Try asking:**
+- "How do I prevent rebound effects?"
+- "What are the best energy efficiency strategies?"
+- "How can I optimize peak hour usage?"
+- "Tell me about carbon offset programs"
+- "How do I improve my team's sustainability behavior?"
+
+I'll provide comprehensive, actionable answers!"""
+
+# Keywords per topic, including the languages the chat answers in.
+# The English topic name itself is always a keyword.
+TOPIC_SYNONYMS = {
+    "rebound": (
+        "rebounds", "rebounding", "rebote", "rebond", "反弹", "回弹", "रिबाउंड",
+        "ارتداد", "الارتداد",
+    ),
+    "efficiency": (
+        "eficiencia", "eficiência", "efficacité", "efficacite", "effizienz",
+        "能效", "效率", "दक्षता", "كفاءة", "الكفاءة",
+    ),
+    "carbon": (
+        "co2", "co₂", "carbono", "carbone", "kohlenstoff", "kohlendioxid",
+        "碳", "कार्बन", "كربون", "الكربون",
+    ),
+    "peak": (
+        "peaks", "pico", "picos", "heures de pointe", "spitzenlast", "spitzenzeit",
+        "高峰", "峰值", "पीक", "ذروة", "الذروة",
+    ),
+    "behavior": (
+        "behaviors", "behavioral", "behaviour", "behaviours", "behavioural",
+        "comportamiento", "comportement", "comportamento", "verhalten",
+        "行为", "व्यवहार", "سلوك", "السلوك",
+    ),
+}
+
+TOPIC_PROMPT = """You are GreenGap's sustainability AI assistant powered by Pathway RAG and Google Gemini.
+
+Using this knowledge from our Pathway database about {topic}:
+
+{context}
+
+User's question: {question}
+
+IMPORTANT: Respond in {language} language.
+
+Provide a comprehensive answer (250-400 words) that:
+1. Directly addresses their question
+2. Expands on the knowledge above
+3. Adds practical, actionable steps
+4. Mentions GreenGap platform features when relevant
+5. Is professional and encouraging
+
+Make it conversational and helpful!"""
+
+GENERAL_PROMPT = """You are GreenGap's sustainability AI assistant.
+
+GreenGap helps organizations:
+- Detect rebound effects (efficiency → increased consumption)
+- Monitor sustainability metrics (CO₂, efficiency, behavior)
+- Provide AI-powered recommendations using Pathway RAG
+- Track carbon footprint
+
+User's question: {question}
+
+IMPORTANT: Respond in {language} language.
+
+Provide a detailed answer (250-350 words) about this sustainability topic. Include:
+- Clear explanation
+- Actionable steps
+- Expected outcomes
+- Professional tone
+
+If unrelated to sustainability, redirect to: energy efficiency, rebound effects, carbon reduction, peak optimization, or behavior improvement."""
+
+
+# Scripts written without spaces between words, where keywords match anywhere
+_UNSPACED_SCRIPT = re.compile(r"[\u3040-\u30ff\u3400-\u9fff\uf900-\ufaff]")
+
+
+def _keyword_pattern(keyword: str) -> str:
+    """A keyword as a whole word ("pico" must not match inside "típico")."""
+    if _UNSPACED_SCRIPT.search(keyword):
+        return re.escape(keyword)
+    return rf"(?<!\w){re.escape(keyword)}(?!\w)"
+
+
+class TopicMatcher:
+    """
+    Finds the chat topic of a question in one regex pass.
+
+    All keywords are casefolded and compiled into a single alternation
+    (longest first), so a question is scanned once no matter how many
+    topics or synonyms exist. Keywords match whole words only, except in
+    Chinese / Japanese text, which has no word separators. When several
+    topics appear, the one listed first in `topics` wins, as the old
+    per-keyword loop did.
+    """
+
+    def __init__(self, topics, synonyms):
+        self.topics = list(topics)
+        self._priority = {topic: i for i, topic in enumerate(self.topics)}
+        self._keyword_topic = {}
+        for topic in self.topics:
+            for keyword in (topic, *synonyms.get(topic, ())):
+                self._keyword_topic.setdefault(keyword.casefold(), topic)
+
+        keywords = sorted(self._keyword_topic, key=len, reverse=True)
+        self._pattern = re.compile("|".join(map(_keyword_pattern, keywords)))
+
+    def match(self, text: str):
+        """Returns the highest-priority topic mentioned in text, or None."""
+        best = None
+        for found in self._pattern.finditer(text.casefold()):
+            topic = self._keyword_topic[found.group()]
+            if best is None or self._priority[topic] < self._priority[best]:
+                best = topic
+                if self._priority[best] == 0:
+                    break
+        return best
+
+
+topic_matcher = TopicMatcher(FALLBACK_RESPONSES, TOPIC_SYNONYMS)
+
+
+def language_name(code: str) -> str:
+    return LANGUAGE_NAMES.get(code, DEFAULT_LANGUAGE)
+
+
+def build_chat_prompt(question: str, language: str, topic=None, passages=(), max_context_tokens: int = CHAT_CONTEXT_TOKENS):
+    """
+    Gemini prompt and its size stats. When a topic matched, the prompt is
+    grounded in the topic's knowledge plus retrieved (score, text)
+    passages, packed into max_context_tokens estimated tokens.
+    """
+    if topic is None:
+        prompt = GENERAL_PROMPT.format(question=question, language=language)
+        return prompt, {"prompt_tokens": estimate_tokens(prompt)}
+
+    # The topic's own answer ranks level with the best retrieved document
+    top_score = max((score for score, _ in passages), default=1)
+    context, stats = pack_context(question, [(top_score, FALLBACK_RESPONSES[topic]), *passages], max_context_tokens)
+    prompt = TOPIC_PROMPT.format(topic=topic, context=context, question=question, language=language)
+    return prompt, {"prompt_tokens": estimate_tokens(prompt), **stats}
@@ -0,0 +1,123 @@
+import hashlib
+from datetime import datetime
+
+import numpy as np
+
+from app.data.simulator import generate_simulated_data
+from app.pathway_pipeline import rag_system
+from app.services.behavior_analyzer import analyze_behavior
+from app.services.metrics_engine import calculate_climate_metrics
+from app.services.rebound_detector import detect_rebound
+from app.services.recommendation_engine import generate_recommendations
+
+DEFAULT_SCENARIO = "default"
+
+DEMO_DAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+BEHAVIOR_INSIGHTS = [
+    "High usage detected during peak hours - Pathway AI analyzing patterns",
+    "Reduced consumption behavior observed - efficiency gains maintained",
+    "Weekend usage spike detected - potential rebound effect identified",
+    "Consistent usage patterns - sustainable behavior maintained",
+    "Evening consumption increased - review automated controls",
+    "Energy-efficient practices adopted successfully"
+]
+
+FALLBACK_RECOMMENDATIONS = [
+    "Enable automated scheduling to optimize energy consumption patterns",
+    "Monitor weekly usage trends and adjust behavior accordingly",
+    "Implement smart controls during peak consumption hours"
+]
+
+
+def scenario_seed(scenario_id: str) -> int:
+    """Maps a scenario ID to a stable 32-bit seed."""
+    digest = hashlib.sha256(scenario_id.encode("utf-8")).hexdigest()
+    return int(digest[:8], 16)
+
+
+def run_demo_analysis(seed: int, rag=None, settings=None):
+    """
+    Runs the services pipeline on simulated data for one seed.
+
+    The same seed always produces the same dashboard (apart from the
+    timestamp), so results can be memoized and served with an ETag.
+    rag / settings default to the shared knowledge base and settings.
+    """
+
+    rag = rag or rag_system
+
+    scenario_rng_seed, data_seed = np.random.SeedSequence(seed).spawn(2)
+    rng = np.random.default_rng(scenario_rng_seed)
+
+    efficiency_gain = float(rng.uniform(0.15, 0.35))
+    rebound_factor = float(rng.uniform(0.05, 0.95))
+
+    data = generate_simulated_data(
+        days=len(DEMO_DAYS),
+        seed=data_seed,
+        efficiency_gain=efficiency_gain,
+        rebound_factor=rebound_factor,
+    )
+
+    rebound_result = detect_rebound(data, settings)
+    behavior_result = analyze_behavior(data)
+    recommendation_result = generate_recommendations(rebound_result, behavior_result, settings=settings)
+    metrics_result = calculate_climate_metrics(rebound_result, behavior_result, settings)
+
+    sustainability_index = round(metrics_result["sustainability_index"], 1)
+    co2_saved = round(metrics_result["co2_saved"], 2)
+    efficiency_score = round(metrics_result["efficiency_score"], 1)
+    behavior_score = round(float(metrics_result["behavior_score"]), 1)
+    rebound_level = rebound_result["rebound_level"]
+    rebound_percentage = int(round(rebound_result["rebound_index"] * 100))
+
+    # Savings still achieved once half of the rebound is recovered
+    corrected_projection = round(
+        rebound_result["baseline_avg"] - recommendation_result["corrected_emission_projection"], 2
+    )
+
+    behavior_reason = BEHAVIOR_INSIGHTS[int(rng.integers(len(BEHAVIOR_INSIGHTS)))]
+
+    user_data = {
+        "sustainability_index": sustainability_index,
+        "co2_saved": co2_saved,
+        "efficiency_score": efficiency_score,
+        "behavior_score": behavior_score,
+        "rebound_level": rebound_level,
+        "rebound_percentage": rebound_percentage
+    }
+
+    try:
+        recommendations = rag.generate_recommendations(user_data)
+    except Exception as e:
+        print(f" Pathway error: {e}")
+        recommendations = list(FALLBACK_RECOMMENDATIONS)
+
+    return {
+        "summary_cards": {
+            "sustainability_index": sustainability_index,
+            "co2_saved": co2_saved,
+            "efficiency_score": efficiency_score,
+            "behavior_score": behavior_score
+        },
+        "rebound_level": rebound_level,
+        "rebound_percentage": rebound_percentage,
+        "corrected_projection": corrected_projection,
+        "behavior_insights": {
+            "behavior_reason": behavior_reason
+        },
+        "emissions_chart": {
+            "labels": DEMO_DAYS,
+            "baseline": [round(v, 1) for v in data["baseline"]],
+            "expected": [round(v, 1) for v in data["expected"]],
+            "actual": [round(v, 1) for v in data["actual"]]
+        },
+        "recommendations": recommendations,
+        "timestamp": datetime.now().isoformat(),
+        "analysis_id": 1000 + seed % 9000,
+        "seed": seed,
+        "ai_engine": "Pathway RAG + Gemini",
+        "rag_enabled": True,
+        "knowledge_docs_used": len(rag.find_relevant_knowledge(user_data))
+    }
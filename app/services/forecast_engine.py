@@ -0,0 +1,195 @@
+import itertools
+import warnings
+
+import numpy as np
+
+# Weekly seasonality on daily readings
+SEASON_DAYS = 7
+
+# Smoothing parameters tried per series (level, trend, season); the trend
+# is damped so multi-week forecasts flatten out instead of running away
+ALPHA_GRID = (0.05, 0.15, 0.3, 0.5, 0.8)
+BETA_GRID = (0.0, 0.05, 0.2)
+GAMMA_GRID = (0.05, 0.15, 0.3)
+DAMPING = 0.95
+
+# Missing days stepped through explicitly by skip(); beyond this the damped
+# trend has died out and only the seasonal phase needs to move
+MAX_SKIP_STEPS = 4 * SEASON_DAYS
+
+
+class HoltWintersState:
+    """
+    Fitted additive Holt-Winters state for a batch of daily series.
+
+    Arrays are per series: level, trend, season (series x SEASON_DAYS)
+    and the chosen smoothing parameters. phase is the seasonal slot of
+    the next day, shared by every series in the batch. update() folds in
+    one new day for all series in O(1) each, so forecasts stay current
+    without refitting; forecast() reads the state only.
+    """
+
+    def __init__(self, level, trend, season, alpha, beta, gamma, phase: int, rmse, observations: int):
+        self.level = level
+        self.trend = trend
+        self.season = season
+        self.alpha = alpha
+        self.beta = beta
+        self.gamma = gamma
+        self.phase = phase
+        self.rmse = rmse
+        self.observations = observations
+
+    def update(self, values):
+        """Folds in one day per series; NaN marks a missing reading."""
+
+        values = np.asarray(values, dtype=np.float64)
+        self.level, self.trend, self.season[:, self.phase], _ = _step(
+            values, self.level, self.trend, self.season[:, self.phase], self.alpha, self.beta, self.gamma
+        )
+        self.phase = (self.phase + 1) % SEASON_DAYS
+        self.observations += 1
+
+    def skip(self, days: int):
+        """Advances over days with no readings for any series."""
+
+        missing = np.full(self.level.shape, np.nan)
+        for _ in range(min(days, MAX_SKIP_STEPS)):
+            self.update(missing)
+        if days > MAX_SKIP_STEPS:
+            self.phase = (self.phase + days - MAX_SKIP_STEPS) % SEASON_DAYS
+            self.observations += days - MAX_SKIP_STEPS
+
+    def forecast(self, horizon: int) -> np.ndarray:
+        """Point forecasts for the next horizon days, shape (series, horizon)."""
+
+        steps = np.arange(1, horizon + 1)
+        damped_steps = np.cumsum(DAMPING ** steps)
+        slots = (self.phase + steps - 1) % SEASON_DAYS
+        return self.level[:, None] + self.trend[:, None] * damped_steps + self.season[:, slots]
+
+
+def _step(y, level, trend, season, alpha, beta, gamma):
+    """One additive damped Holt-Winters update; returns (level, trend, season, error)."""
+
+    prediction = level + DAMPING * trend + season
+    observed = np.isfinite(y)
+    y = np.where(observed, y, prediction)
+
+    new_level = alpha * (y - season) + (1 - alpha) * (level + DAMPING * trend)
+    new_trend = beta * (new_level - level) + (1 - beta) * DAMPING * trend
+    new_season = gamma * (y - new_level) + (1 - gamma) * season
+    return new_level, new_trend, new_season, np.where(observed, y - prediction, 0.0)
+
+
+def _initial_state(y: np.ndarray):
+    """Level, trend and seasonal offsets from the first two weeks of each series."""
+
+    padded = np.full((y.shape[0], 2 * SEASON_DAYS), np.nan)
+    head = y[:, :2 * SEASON_DAYS]
+    padded[:, :head.shape[1]] = head
+    first, second = padded[:, :SEASON_DAYS], padded[:, SEASON_DAYS:]
+
+    # Rows without a full first or second week give NaN means, filled below
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        first_mean = np.nanmean(first, axis=1)
+        second_mean = np.nanmean(second, axis=1)
+        level = np.where(np.isfinite(first_mean), first_mean, np.nanmean(y, axis=1))
+    trend = np.nan_to_num((second_mean - first_mean) / SEASON_DAYS)
+    season = np.nan_to_num(first - level[:, None])
+    return np.nan_to_num(level), trend, season
+
+
+def fit_holt_winters(y) -> HoltWintersState:
+    """
+    Fits additive Holt-Winters with weekly seasonality to every row of a
+    (series, days) matrix (NaN = missing day) and returns the state after
+    the last day.
+
+    Every parameter combination in the grid runs for every series in the
+    same vectorized pass over the days, and each series keeps the
+    combination with the lowest one-step-ahead squared error. Series
+    shorter than two weeks get no trend and whatever seasonal offsets
+    the data supports.
+    """
+
+    y = np.atleast_2d(np.asarray(y, dtype=np.float64))
+    series, days = y.shape
+    grid = np.array(list(itertools.product(ALPHA_GRID, BETA_GRID, GAMMA_GRID)))
+    alpha, beta, gamma = (grid[:, i, None] for i in range(3))
+
+    level, trend, season = _initial_state(y)
+    combos = len(grid)
+    level = np.broadcast_to(level, (combos, series)).copy()
+    trend = np.broadcast_to(trend, (combos, series)).copy()
+    season = np.broadcast_to(season, (combos, series, SEASON_DAYS)).copy()
+    sse = np.zeros((combos, series))
+
+    for t in range(days):
+        slot = t % SEASON_DAYS
+        level, trend, season[:, :, slot], error = _step(
+            y[:, t], level, trend, season[:, :, slot], alpha, beta, gamma
+        )
+        # The first week only settles the initial state
+        if t >= SEASON_DAYS:
+            sse += error ** 2
+
+    best = sse.argmin(axis=0)
+    pick = (best, np.arange(series))
+    observed = np.maximum(np.isfinite(y[:, SEASON_DAYS:]).sum(axis=1), 1)
+    return HoltWintersState(
+        level=level[pick],
+        trend=trend[pick],
+        season=season[pick],
+        alpha=grid[best, 0],
+        beta=grid[best, 1],
+        gamma=grid[best, 2],
+        phase=days % SEASON_DAYS,
+        rmse=np.sqrt(sse[pick] / observed),
+        observations=days,
+    )
+
+
+def consumption_forecast(state: HoltWintersState, horizon: int) -> dict:
+    """
+    Expected vs actual forecast from a state fitted on the stacked
+    [expected rows; actual rows] matrix (see fit_consumption).
+    """
+
+    values = np.maximum(state.forecast(horizon), 0.0)
+    expected, actual = np.split(values, 2)
+    return {
+        "horizon_days": horizon,
+        "expected": expected,
+        "actual": actual,
+        "rebound_gap": actual - expected,
+        "rmse": np.split(state.rmse, 2),
+    }
+
+
+def fit_consumption(expected, actual) -> HoltWintersState:
+    """Fits expected and actual series of many sites in one batch."""
+
+    expected = np.atleast_2d(np.asarray(expected, dtype=np.float64))
+    actual = np.atleast_2d(np.asarray(actual, dtype=np.float64))
+    return fit_holt_winters(np.vstack([expected, actual]))
+
+
+def forecast_summary(forecast: dict, site: int = 0) -> dict:
+    """JSON-ready forecast for one site of a consumption_forecast result."""
+
+    expected = forecast["expected"][site]
+    actual = forecast["actual"][site]
+    return {
+        "horizon_days": forecast["horizon_days"],
+        "expected": np.round(expected, 2).tolist(),
+        "actual": np.round(actual, 2).tolist(),
+        "expected_avg": float(expected.mean()),
+        "actual_avg": float(actual.mean()),
+        "rebound_gap_avg": float((actual - expected).mean()),
+        "rmse": {
+            "expected": float(forecast["rmse"][0][site]),
+            "actual": float(forecast["rmse"][1][site]),
+        },
+    }
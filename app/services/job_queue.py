@@ -0,0 +1,130 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.core.config import ENV_PREFIX, get_settings
+from app.db.job_store import FAILED, FINISHED_STATUSES, RUNNING, SUCCEEDED, JobStore
+
+JSON_RESULT = "application/json"
+
+
+class JobFailed(Exception):
+    """Raised by a handler to fail a job; detail is kept as the job result."""
+
+    def __init__(self, message: str, detail: dict = None):
+        super().__init__(message)
+        self.detail = detail
+
+
+class JobQueue:
+    """
+    Runs registered job kinds on a local thread pool.
+
+    Handlers are called as handler(job, payload, progress) and return
+    (media_type, result), where result is bytes or a JSON-serializable
+    value. progress(fraction, message) records progress that pollers and
+    subscribers can see.
+    """
+
+    def __init__(self, store: JobStore, workers: int = 2, retention_seconds: float = 86400):
+        self.store = store
+        self.workers = workers
+        self.retention_seconds = retention_seconds
+        self._handlers = {}
+        self._executor = None
+        self._start_lock = threading.Lock()
+        self._changed = threading.Condition()
+
+    def register(self, kind: str, handler):
+        self._handlers[kind] = handler
+
+    def start(self):
+        """Starts the worker pool and resumes jobs a previous process left queued."""
+        with self._start_lock:
+            if self._executor is not None:
+                return
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="greengap-job")
+        for job_id in self.store.requeue_interrupted():
+            self._executor.submit(self._run, job_id)
+
+    def submit(self, kind: str, tenant_id: str, params: dict = None, payload: bytes = None, dedupe_key: str = None):
+        """Queues a job and returns its record; identical unfinished jobs are reused."""
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        self.start()
+        self.store.purge_finished(self.retention_seconds)
+
+        job_id, created = self.store.create(kind, tenant_id, params, payload, dedupe_key)
+        if created:
+            self._executor.submit(self._run, job_id)
+        return self.store.get(job_id)
+
+    def get(self, job_id: str):
+        return self.store.get(job_id)
+
+    def result(self, job_id: str):
+        """Returns (media_type, result); JSON results are decoded."""
+        media_type, result = self.store.result(job_id)
+        if media_type == JSON_RESULT and result is not None:
+            return media_type, json.loads(result)
+        return media_type, result
+
+    def wait(self, job_id: str, after_version: int, timeout: float):
+        """
+        Blocks until the job changes past after_version, finishes, or
+        timeout elapses; returns the current job record (None if unknown).
+        """
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while True:
+                job = self.store.get(job_id)
+                if job is None or job["version"] > after_version or job["status"] in FINISHED_STATUSES:
+                    return job
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return job
+                self._changed.wait(remaining)
+
+    def _update(self, job_id: str, **fields):
+        self.store.update(job_id, **fields)
+        with self._changed:
+            self._changed.notify_all()
+
+    def _run(self, job_id: str):
+        job = self.store.get(job_id)
+        if job is None:
+            return
+        handler = self._handlers.get(job["kind"])
+        self._update(job_id, status=RUNNING, progress=0.0, message="Started")
+
+        def progress(fraction: float, message: str = None):
+            self._update(job_id, progress=float(min(max(fraction, 0.0), 1.0)), message=message)
+
+        try:
+            if handler is None:
+                raise JobFailed(f"No handler for job kind: {job['kind']}")
+            media_type, result = handler(job, self.store.payload(job_id), progress)
+            if not isinstance(result, bytes):
+                result = json.dumps(result, default=str).encode("utf-8")
+            self._update(
+                job_id, status=SUCCEEDED, progress=1.0, message="Done",
+                result=result, result_type=media_type, payload=None
+            )
+        except JobFailed as e:
+            detail = json.dumps(e.detail, default=str).encode("utf-8") if e.detail is not None else None
+            self._update(job_id, status=FAILED, error=str(e), result=detail, result_type=JSON_RESULT if detail else None)
+        except Exception as e:
+            print(f" Job {job_id} ({job['kind']}) failed: {e}")
+            self._update(job_id, status=FAILED, error=str(e))
+
+
+def _create_job_queue():
+    settings = get_settings()
+    # Set GREENGAP_JOB_DB to a file path to keep queued jobs across restarts
+    store = JobStore(os.getenv(ENV_PREFIX + "JOB_DB", ":memory:"))
+    return JobQueue(store, workers=settings.job_workers, retention_seconds=settings.job_retention_seconds)
+
+
+job_queue = _create_job_queue()
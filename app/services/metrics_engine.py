@@ -1,8 +1,12 @@
-def calculate_climate_metrics(rebound_result: dict, behavior_result: dict):
+from app.core.config import get_settings
+
+def calculate_climate_metrics(rebound_result: dict, behavior_result: dict, settings=None):
     """
     Calculates sustainability metrics for GreenGap dashboard.
     """
 
+    settings = settings or get_settings()
+
     baseline = rebound_result.get("baseline_avg", 0)
     actual = rebound_result.get("actual_avg", 0)
     rebound_index = rebound_result.get("rebound_index", 0)
@@ -23,7 +27,7 @@ def calculate_climate_metrics(rebound_result: dict, behavior_result: dict):
         behavior_score = 60
 
     # ⭐ GreenGap Sustainability Index
-    sustainability_index = (efficiency_score * 0.6) + (behavior_score * 0.4)
+    sustainability_index = settings.sustainability_index(efficiency_score, behavior_score)
 
     return {
         "co2_saved": co2_saved,
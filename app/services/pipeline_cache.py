@@ -0,0 +1,161 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from app.utils.hashing import canonical_json
+
+
+def estimate_size(value) -> int:
+    """Approximate memory footprint of a cached value in bytes."""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, tuple):
+        return sum(estimate_size(v) for v in value)
+    try:
+        return len(canonical_json(value))
+    except (TypeError, ValueError):
+        return 1024
+
+
+class ByteBudget:
+    """
+    Byte quota shared by several caches (e.g. every tenant's), so their
+    combined size stays under max_bytes however many caches exist.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.bytes_used = 0
+        self._lock = threading.Lock()
+
+    def reserve(self, size: int) -> bool:
+        """Claims size bytes if they fit; returns whether they did."""
+        with self._lock:
+            if self.bytes_used + size > self.max_bytes:
+                return False
+            self.bytes_used += size
+            return True
+
+    def release(self, size: int):
+        with self._lock:
+            self.bytes_used -= size
+
+    def stats(self):
+        with self._lock:
+            return {"bytes_used": self.bytes_used, "max_bytes": self.max_bytes}
+
+
+class StageCache:
+    """
+    Thread-safe LRU cache for pipeline stage results.
+
+    Keys are tuples such as ("rebound", data_hash); values are the stage
+    outputs, which callers must treat as read-only. Entries are evicted
+    when either max_entries or the optional max_bytes quota is exceeded.
+    With a shared ByteBudget, a put that does not fit the budget evicts
+    this cache's own oldest entries first and is dropped if it still
+    does not fit.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = None, budget: ByteBudget = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.budget = budget
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        sized = self.max_bytes is not None or self.budget is not None
+        size = estimate_size(value) if sized else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            # Larger than the whole quota: don't flush everything for it
+            return
+
+        with self._lock:
+            if key in self._entries:
+                del self._entries[key]
+                self._release(self._sizes.pop(key))
+            if self.budget is not None:
+                while not self.budget.reserve(size):
+                    if not self._entries:
+                        # Other caches hold the shared budget
+                        return
+                    self._evict_oldest()
+            self._entries[key] = value
+            self._sizes[key] = size
+            self.bytes_used += size
+
+            while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None and self.bytes_used > self.max_bytes
+            ):
+                self._evict_oldest()
+
+    def _release(self, size: int):
+        self.bytes_used -= size
+        if self.budget is not None:
+            self.budget.release(size)
+
+    def _evict_oldest(self):
+        old_key, _ = self._entries.popitem(last=False)
+        self._release(self._sizes.pop(old_key))
+        self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """
+        Returns (value, hit). compute() runs outside the lock, so two
+        threads racing on the same cold key may both compute it once.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key], True
+            self.misses += 1
+
+        value = compute()
+        self.put(key, value)
+        return value, False
+
+    def clear(self):
+        with self._lock:
+            if self.budget is not None:
+                self.budget.release(self.bytes_used)
+            self._entries.clear()
+            self._sizes.clear()
+            self.bytes_used = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes_used": self.bytes_used,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+
+# Shared by every request running the analysis pipeline
+stage_cache = StageCache()
@@ -0,0 +1,117 @@
+"""
+Token-budgeted context for LLM prompts.
+
+Retrieved passages are split into sentences, ranked by retrieval score
+plus overlap with the question, near-duplicate sentences (the same fact
+worded by two documents) are dropped, and the best sentences are packed
+greedily into a token budget. Kept sentences are emitted in their
+original passage order so the context still reads naturally.
+
+Token counts are a local estimate (word pieces of up to four characters
+and punctuation marks), close enough to Gemini's tokenizer for budgeting
+without a network call.
+"""
+
+import re
+
+_TOKEN = re.compile(r"\w{1,4}|[^\w\s]")
+_TERM = re.compile(r"\w+")
+# A period after a bare number ("1. Audit") is list numbering, not a sentence end
+_SENTENCE_END = re.compile(r"(?<=[^\d\s][.!?])\s+|\n+")
+_MARKUP = re.compile(r"^[\s*#>-]*(?:\d+\.\s+)?|\*+")
+
+# Sentences whose term sets overlap at least this much (Jaccard) repeat each other
+DUPLICATE_OVERLAP = 0.7
+
+# Weight of question-term overlap (share of question terms in a sentence)
+# against the passage's retrieval score, scaled so the best passage has 1
+QUERY_WEIGHT = 1.0
+
+# Common words ignored when matching questions to sentences
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it its me my of on or "
+    "our should so that the their this to use was we what when which who why will with you your".split()
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate LLM token count of text."""
+    return len(_TOKEN.findall(text))
+
+
+def content_terms(text: str) -> frozenset:
+    """Casefolded words of text, without stopwords."""
+    return frozenset(t for t in _TERM.findall(text.casefold()) if t not in _STOPWORDS and len(t) > 1)
+
+
+def split_sentences(text: str):
+    """
+    Sentences and list items of a passage, with list markers and markdown
+    emphasis removed. Headings that only introduce a list ("To do this:")
+    are left out.
+    """
+    sentences = []
+    for part in _SENTENCE_END.split(text):
+        part = _MARKUP.sub("", part).strip()
+        if _TERM.search(part) and not part.endswith(":"):
+            # List items get a full stop so packed items still read apart
+            sentences.append(part if part[-1] in ".!?" else part + ".")
+    return sentences
+
+
+def pack_passages(question: str, passages, max_tokens: int):
+    """
+    Best sentences of (score, text) passages within max_tokens.
+
+    Returns the packed passages (those that kept any sentences, in the
+    given order) and stats comparing them with the unbudgeted passages.
+    """
+
+    query = content_terms(question)
+    top_score = max((score for score, _ in passages), default=0) or 1
+    candidates = []
+    candidate_tokens = 0
+    for p, (score, text) in enumerate(passages):
+        candidate_tokens += estimate_tokens(text)
+        for s, sentence in enumerate(split_sentences(text)):
+            terms = content_terms(sentence)
+            overlap = len(query & terms) / len(query) if query else 0.0
+            # Earlier sentences of a passage carry its topic; a small tilt keeps ties in order
+            rank = score / top_score + QUERY_WEIGHT * overlap - 0.01 * s
+            candidates.append((rank, p, s, sentence, terms))
+    candidates.sort(key=lambda c: (-c[0], c[1], c[2]))
+
+    chosen, chosen_terms = [], []
+    used = duplicates = 0
+    for rank, p, s, sentence, terms in candidates:
+        if any(len(terms & other) / len(terms | other) >= DUPLICATE_OVERLAP for other in chosen_terms if terms | other):
+            duplicates += 1
+            continue
+        tokens = estimate_tokens(sentence) + 1
+        if used + tokens > max_tokens:
+            continue
+        used += tokens
+        chosen.append((p, s, sentence))
+        chosen_terms.append(terms)
+
+    packed = {}
+    for p, s, sentence in sorted(chosen):
+        packed.setdefault(p, []).append(sentence)
+    packed = [" ".join(sentences) for sentences in packed.values()]
+
+    return packed, {
+        "passages": len(passages),
+        "passages_used": len(packed),
+        "sentences": len(candidates),
+        "sentences_used": len(chosen),
+        "duplicates_dropped": duplicates,
+        "candidate_tokens": candidate_tokens,
+        "context_tokens": sum(map(estimate_tokens, packed)),
+        "max_tokens": max_tokens,
+    }
+
+
+def pack_context(question: str, passages, max_tokens: int):
+    """pack_passages joined into one context block, one paragraph per passage."""
+    packed, stats = pack_passages(question, passages, max_tokens)
+    return "\n\n".join(packed), stats
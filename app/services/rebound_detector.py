@@ -1,6 +1,15 @@
 import numpy as np
+from app.core.config import get_settings
 
-def detect_rebound(data: dict):
+def classify_rebound_index(rebound_index, settings=None):
+    """
+    Maps rebound index values to LOW / MEDIUM / HIGH in one vectorized
+    call; accepts a scalar or a whole fleet's array.
+    """
+    settings = settings or get_settings()
+    return settings.index_classifier.classify(rebound_index)
+
+def detect_rebound(data: dict, settings=None):
     baseline = np.array(data["baseline"])
     expected = np.array(data["expected"])
     actual = np.array(data["actual"])
@@ -18,12 +27,7 @@ def detect_rebound(data: dict):
     if expected_reduction != 0:
         rebound_index = rebound_loss / expected_reduction
 
-    if rebound_index < 0.2:
-        level = "LOW"
-    elif rebound_index < 0.5:
-        level = "MEDIUM"
-    else:
-        level = "HIGH"
+    level = classify_rebound_index(rebound_index, settings)
 
     # Graph-ready structure
     graph_data = {
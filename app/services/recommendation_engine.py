@@ -1,22 +1,48 @@
-def generate_recommendations(rebound_result: dict, behavior_result: dict):
+from app.core.config import get_settings
+
+def generate_recommendations(
+    rebound_result: dict,
+    behavior_result: dict,
+    high_threshold: float = None,
+    medium_threshold: float = None,
+    projection_blend: float = None,
+    settings=None,
+    forecast_result: dict = None,
+):
     """
     Generates climate behavior recommendations based on rebound detection.
+
+    high_threshold / medium_threshold:
+        Rebound index above which the high / moderate advice applies.
+        Default to the configured rebound index thresholds.
+    projection_blend:
+        Share of the rebound gap assumed to remain in the corrected projection.
+    forecast_result:
+        Holt-Winters forecast (forecast_engine.forecast_summary); when given,
+        the projection blends the forecast expected / actual averages
+        instead of the historical ones.
     """
 
+    settings = settings or get_settings()
+    default_medium, default_high = settings.rebound_index_thresholds
+    high_threshold = default_high if high_threshold is None else high_threshold
+    medium_threshold = default_medium if medium_threshold is None else medium_threshold
+    projection_blend = settings.projection_blend if projection_blend is None else projection_blend
+
     rebound_index = rebound_result.get("rebound_index", 0)
     behavior_reason = behavior_result.get("behavior_reason", "")
 
     recommendations = []
 
     # Based on rebound level
-    if rebound_index > 0.5:
+    if rebound_index > high_threshold:
         recommendations.append(
             "High rebound detected: reduce usage duration after efficiency adoption."
         )
         recommendations.append(
             "Set smart usage schedules to prevent overconsumption."
         )
-    elif rebound_index > 0.2:
+    elif rebound_index > medium_threshold:
         recommendations.append(
             "Moderate rebound: monitor usage patterns and avoid extended runtime."
         )
@@ -31,10 +57,12 @@ def generate_recommendations(rebound_result: dict, behavior_result: dict):
             "Behavioral rebound detected: efficiency gains may be encouraging overuse."
         )
 
-    # Example corrected projection (simple improvement model)
-    corrected_projection = rebound_result["expected_avg"] + (
-        rebound_result["actual_avg"] - rebound_result["expected_avg"]
-    ) * 0.5
+    # Corrected projection: expected consumption plus the share of the
+    # rebound gap that remains, over the forecast horizon when available
+    projected = forecast_result or rebound_result
+    corrected_projection = projected["expected_avg"] + (
+        projected["actual_avg"] - projected["expected_avg"]
+    ) * projection_blend
 
     return {
         "recommendations": recommendations,
@@ -1,3 +1,6 @@
+import numpy as np
+
+
 def simulate_scenario(rebound_result: dict, reduction_factor: float = 0.1):
     """
     Simulates a future scenario where emissions reduce by a given factor.
@@ -28,3 +31,116 @@ def simulate_scenario(rebound_result: dict, reduction_factor: float = 0.1):
         "improvement": improvement,
         "simulated_sustainability": simulated_sustainability
     }
+
+
+def parameter_values(spec):
+    """
+    Expands a parameter range into a 1-D float array.
+
+    spec may be a scalar, a sequence of values, or a dict with
+    start / stop / num (inclusive linspace).
+    """
+
+    if isinstance(spec, dict):
+        return np.linspace(spec["start"], spec["stop"], int(spec.get("num", 11)), dtype=np.float64)
+    return np.atleast_1d(np.asarray(spec, dtype=np.float64))
+
+
+def pareto_front(cost, benefit):
+    """
+    Returns indices of points not dominated on (lower cost, higher benefit),
+    ordered by increasing cost.
+    """
+
+    cost = np.asarray(cost, dtype=np.float64).ravel()
+    benefit = np.asarray(benefit, dtype=np.float64).ravel()
+
+    # Cheapest first; among equal cost, best benefit first
+    order = np.lexsort((-benefit, cost))
+    sorted_benefit = benefit[order]
+
+    best_before = np.maximum.accumulate(np.concatenate(([-np.inf], sorted_benefit[:-1])))
+    keep = sorted_benefit > best_before
+    return order[keep]
+
+
+def simulate_scenario_grid(
+    baseline_avg,
+    actual_avg,
+    reduction_factors=0.1,
+    efficiency_gains=0.0,
+    rebound_assumptions=0.0,
+    reduction_cost: float = 1.0,
+    efficiency_cost: float = 1.0,
+    rebound_aggregate: str = "mean",
+):
+    """
+    Evaluates a full what-if grid for many sites in one NumPy broadcast.
+
+    For each site and every (reduction_factor, efficiency_gain,
+    rebound_assumption) combination:
+
+        projected = actual * (1 - efficiency_gain * (1 - rebound)) * (1 - reduction_factor)
+
+    With efficiency_gain = 0 this matches simulate_scenario().
+
+    The result cube is shaped (sites, reduction, efficiency, rebound).
+    Pareto-optimal (reduction, efficiency) options trade intervention cost
+    (reduction_cost * r + efficiency_cost * e) against fleet-wide
+    improvement, with rebound folded in by its mean or worst case.
+    """
+
+    baseline = np.atleast_1d(np.asarray(baseline_avg, dtype=np.float64))
+    actual = np.atleast_1d(np.asarray(actual_avg, dtype=np.float64))
+    r = parameter_values(reduction_factors)
+    e = parameter_values(efficiency_gains)
+    b = parameter_values(rebound_assumptions)
+
+    # Per-parameter factor cube (R, E, B), then one broadcast against the sites
+    retained = (1 - e[None, :, None] * (1 - b[None, None, :])) * (1 - r[:, None, None])
+    projected = actual[:, None, None, None] * retained[None, :, :, :]
+    improvement = actual[:, None, None, None] - projected
+
+    safe_baseline = np.where(baseline != 0, baseline, np.nan)[:, None, None, None]
+    sustainability = np.minimum(100, np.nan_to_num(improvement / safe_baseline) * 100)
+
+    fleet_projected = projected.sum(axis=0)
+    fleet_improvement = improvement.sum(axis=0)
+
+    if rebound_aggregate == "worst":
+        # Worst case is the rebound value leaving the least improvement
+        option_benefit = fleet_improvement.min(axis=2)
+    else:
+        option_benefit = fleet_improvement.mean(axis=2)
+
+    option_cost = reduction_cost * r[:, None] + efficiency_cost * e[None, :]
+    front = pareto_front(option_cost, option_benefit)
+    r_idx, e_idx = np.unravel_index(front, option_cost.shape)
+
+    pareto_options = [
+        {
+            "reduction_factor": float(r[i]),
+            "efficiency_gain": float(e[j]),
+            "cost": float(option_cost[i, j]),
+            "fleet_improvement": float(option_benefit[i, j]),
+            "fleet_projected_emission": float(
+                fleet_projected[i, j].max() if rebound_aggregate == "worst" else fleet_projected[i, j].mean()
+            )
+        }
+        for i, j in zip(r_idx, e_idx)
+    ]
+
+    return {
+        "axes": {
+            "reduction_factor": r,
+            "efficiency_gain": e,
+            "rebound_assumption": b
+        },
+        "projected_emission": projected.astype(np.float32),
+        "improvement": improvement.astype(np.float32),
+        "simulated_sustainability": sustainability.astype(np.float32),
+        "fleet_projected_emission": fleet_projected,
+        "fleet_improvement": fleet_improvement,
+        "pareto_options": pareto_options,
+        "scenario_count": int(projected.size)
+    }
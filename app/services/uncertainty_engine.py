@@ -0,0 +1,126 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from app.core.constants import MONTE_CARLO_SAMPLES, PROJECTION_BLEND
+
+DEFAULT_PERCENTILES = (5, 50, 95)
+
+# Upper bound on resampled day indices held in memory per batch
+_MAX_DRAWS_PER_BATCH = 2_000_000
+
+
+def _bootstrap_sums(values: np.ndarray, n_samples: int, seed_seq) -> np.ndarray:
+    """
+    Draws n_samples day-level bootstrap resamples and returns the
+    resampled column sums, shape (n_samples, columns).
+
+    Each resample is turned into per-day counts with one bincount, so the
+    sums reduce to a single (samples x days) @ (days x columns) product.
+    """
+
+    rng = np.random.default_rng(seed_seq)
+    days = values.shape[0]
+    batch = max(1, _MAX_DRAWS_PER_BATCH // days)
+    sums = np.empty((n_samples, values.shape[1]), dtype=np.float64)
+
+    for start in range(0, n_samples, batch):
+        k = min(batch, n_samples - start)
+        idx = rng.integers(0, days, size=(k, days), dtype=np.int64)
+        idx += (np.arange(k, dtype=np.int64) * days)[:, None]
+        counts = np.bincount(idx.ravel(), minlength=k * days).reshape(k, days)
+        sums[start:start + k] = counts @ values
+
+    return sums
+
+
+def monte_carlo_bands(
+    baseline,
+    expected,
+    actual,
+    n_samples: int = MONTE_CARLO_SAMPLES,
+    percentiles=DEFAULT_PERCENTILES,
+    co2_factor: float = 0.5,
+    projection_blend: float = PROJECTION_BLEND,
+    seed: int = None,
+    workers: int = 1,
+    chunk_size: int = 25_000,
+):
+    """
+    Bootstraps the daily series and returns percentile bands for the
+    rebound index and CO2 projections.
+
+    Days are resampled with replacement (keeping each day's baseline,
+    expected and actual values together). For every resample:
+
+        rebound_index         = (actual - expected) / (baseline - expected)
+        co2_saved             = (baseline - actual) * co2_factor
+        corrected_projection  = savings once projection_blend of the rebound
+                                gap remains, as in generate_recommendations
+
+    Each resample has as many days as the input, so totals stay comparable
+    with the point estimates computed on the full series. With workers > 1
+    the samples are split into chunks evaluated in separate processes; the
+    per-chunk seeds come from one SeedSequence, so results for a given seed
+    do not depend on the worker count.
+    """
+
+    values = np.column_stack([
+        np.asarray(baseline, dtype=np.float64),
+        np.asarray(expected, dtype=np.float64),
+        np.asarray(actual, dtype=np.float64),
+    ])
+    days = values.shape[0]
+    if days == 0:
+        raise ValueError("Cannot bootstrap an empty series")
+
+    n_samples = int(n_samples)
+    if n_samples < 1:
+        raise ValueError("n_samples must be at least 1")
+    chunk_sizes = [chunk_size] * (n_samples // chunk_size)
+    if n_samples % chunk_size:
+        chunk_sizes.append(n_samples % chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+
+    if workers > 1 and len(chunk_sizes) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_bootstrap_sums, [values] * len(chunk_sizes), chunk_sizes, seeds))
+    else:
+        parts = [_bootstrap_sums(values, size, s) for size, s in zip(chunk_sizes, seeds)]
+
+    sums = np.concatenate(parts)
+    baseline_sum, expected_sum, actual_sum = sums[:, 0], sums[:, 1], sums[:, 2]
+
+    expected_reduction = baseline_sum - expected_sum
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rebound_index = np.where(
+            expected_reduction != 0, (actual_sum - expected_sum) / expected_reduction, 0.0
+        )
+
+    co2_saved = (baseline_sum - actual_sum) * co2_factor
+    corrected_sum = expected_sum + (actual_sum - expected_sum) * projection_blend
+    corrected_projection = (baseline_sum - corrected_sum) * co2_factor
+
+    metrics = {
+        "rebound_index": rebound_index,
+        "rebound_percentage": rebound_index * 100,
+        "co2_saved": co2_saved,
+        "corrected_projection": corrected_projection
+    }
+
+    percentiles = list(percentiles)
+    bands = {}
+    for name, samples in metrics.items():
+        levels = np.percentile(samples, percentiles)
+        bands[name] = {
+            "mean": float(samples.mean()),
+            "std": float(samples.std()),
+            **{f"p{p:g}": float(v) for p, v in zip(percentiles, levels)}
+        }
+
+    return {
+        "n_samples": n_samples,
+        "days": days,
+        "percentiles": percentiles,
+        "bands": bands
+    }
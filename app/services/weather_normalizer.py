@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+
+from app.core.constants import WEATHER_MIN_FIT_DAYS
+
+# Label for uploads without a site_id column
+DEFAULT_SITE = "default"
+
+
+def fit_degree_day_models(site_codes, gap, hdd, cdd, n_sites: int, min_days: int = WEATHER_MIN_FIT_DAYS):
+    """
+    Fits gap = intercept + hdd_slope * HDD + cdd_slope * CDD per site by
+    least squares, for all sites at once.
+
+    Rows are in long form (one per site-day, site_codes in 0..n_sites-1);
+    rows with missing degree days are left out. Each site's centered
+    normal equations are accumulated with np.bincount and the stacked
+    (sites, 2, 2) systems are solved with one batched pseudo-inverse, so a
+    site without cooling days simply gets a zero CDD slope. Sites with
+    fewer than min_days usable rows get zero slopes. O(rows + sites).
+    """
+
+    site_codes = np.asarray(site_codes, dtype=np.int64)
+    gap, hdd, cdd = (np.asarray(v, dtype=np.float64) for v in (gap, hdd, cdd))
+    usable = np.isfinite(gap) & np.isfinite(hdd) & np.isfinite(cdd)
+    codes = site_codes[usable]
+    g, h, c = gap[usable], hdd[usable], cdd[usable]
+
+    def total(weights=None):
+        return np.bincount(codes, weights=weights, minlength=n_sites)
+
+    n = total()
+    safe_n = np.maximum(n, 1)
+    mean_g, mean_h, mean_c = total(g) / safe_n, total(h) / safe_n, total(c) / safe_n
+
+    # Centered cross products: S_xy = sum(x * y) - n * mean_x * mean_y
+    s_hh = total(h * h) - n * mean_h * mean_h
+    s_cc = total(c * c) - n * mean_c * mean_c
+    s_hc = total(h * c) - n * mean_h * mean_c
+    s_hg = total(h * g) - n * mean_h * mean_g
+    s_cg = total(c * g) - n * mean_c * mean_g
+    s_gg = total(g * g) - n * mean_g * mean_g
+
+    normal = np.stack([np.stack([s_hh, s_hc], -1), np.stack([s_hc, s_cc], -1)], -2)
+    slopes = (np.linalg.pinv(normal, rcond=1e-10) @ np.stack([s_hg, s_cg], -1)[..., None])[..., 0]
+    slopes[n < min_days] = 0.0
+
+    explained = slopes[:, 0] * s_hg + slopes[:, 1] * s_cg
+    r2 = np.divide(explained, s_gg, out=np.zeros(n_sites), where=s_gg > 0)
+
+    return {
+        "hdd_slope": slopes[:, 0],
+        "cdd_slope": slopes[:, 1],
+        "intercept": mean_g - slopes[:, 0] * mean_h - slopes[:, 1] * mean_c,
+        "r2": np.clip(r2, 0.0, 1.0),
+        "fit_days": n,
+    }
+
+
+def weather_normalize(df: pd.DataFrame, expected, degree_days: dict, site_ids=None) -> dict:
+    """
+    Splits each day's rebound gap (actual - expected) into a weather part
+    and a residual.
+
+    degree_days is DegreeDayTable.lookup() for the rows of df. The weather
+    part is slope * (degree days - normal), using the table's normals when
+    present and zero otherwise, so a cold snap's extra heating no longer
+    counts as rebound. Days without degree days keep their full gap.
+
+    Returns weather_kwh per row plus per-site models and the site labels.
+    """
+
+    actual = df['actual_kwh'].to_numpy(dtype=np.float64)
+    gap = actual - np.asarray(expected, dtype=np.float64)
+
+    if site_ids is None:
+        site_ids = df['site_id'] if 'site_id' in df.columns else np.full(len(df), DEFAULT_SITE)
+    codes, sites = pd.factorize(np.asarray(site_ids))
+
+    hdd, cdd = degree_days["hdd"], degree_days["cdd"]
+    models = fit_degree_day_models(codes, gap, hdd, cdd, len(sites))
+
+    hdd_excess = hdd - np.nan_to_num(degree_days["hdd_normal"])
+    cdd_excess = cdd - np.nan_to_num(degree_days["cdd_normal"])
+    weather = models["hdd_slope"][codes] * hdd_excess + models["cdd_slope"][codes] * cdd_excess
+    weather_kwh = np.where(np.isfinite(weather), weather, 0.0)
+
+    return {
+        "weather_kwh": weather_kwh,
+        "sites": [str(site) for site in sites],
+        "models": models,
+        "covered_days": int(np.isfinite(weather).sum()),
+    }
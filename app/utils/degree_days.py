@@ -0,0 +1,143 @@
+"""
+Daily heating / cooling degree days for weather normalization.
+
+Read from the file at GREENGAP_DEGREE_DAYS_FILE (default
+app/data/degree_days.csv; .csv or .jsonl) with columns
+
+    region,date,hdd,cdd[,hdd_normal,cdd_normal]
+
+region may be omitted (or left blank) for rows that apply to any region.
+hdd_normal / cdd_normal are long-run averages for that day of the year;
+without them, weather normalization removes the whole degree-day term.
+"""
+
+import os
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import ENV_PREFIX
+
+DEFAULT_DEGREE_DAYS_FILE = Path(__file__).resolve().parent.parent / "data" / "degree_days.csv"
+
+# Region codes are packed above the day number in one int64 search key
+_REGION_SHIFT = 32
+_ANY_REGION = ""
+
+DEGREE_DAY_FIELDS = ("hdd", "cdd", "hdd_normal", "cdd_normal")
+
+
+def _day_numbers(dates) -> np.ndarray:
+    values = np.asarray(dates)
+    if values.dtype.kind != "M":
+        values = pd.to_datetime(values, format="ISO8601").values
+    return values.astype("datetime64[D]").astype(np.int64) + (1 << 30)
+
+
+class DegreeDayTable:
+    """
+    Degree days for every (region, day), in one sorted int64 key array
+    with a parallel (rows, 4) float32 value array, so a whole upload is
+    resolved with a single np.searchsorted call.
+    """
+
+    def __init__(self):
+        self.region_codes = {}
+        self._keys = np.empty(0, dtype=np.int64)
+        self._values = np.empty((0, len(DEGREE_DAY_FIELDS)), dtype=np.float32)
+
+    def __len__(self):
+        return len(self._keys)
+
+    @property
+    def regions(self):
+        return sorted(region for region in self.region_codes if region != _ANY_REGION)
+
+    def add(self, df: pd.DataFrame):
+        """Adds region / date / hdd / cdd [/ normals] rows; later rows win on duplicates."""
+        regions = df['region'].fillna(_ANY_REGION).astype(str) if 'region' in df.columns else \
+            pd.Series(_ANY_REGION, index=df.index)
+        for region in pd.unique(regions):
+            self.region_codes.setdefault(region, len(self.region_codes))
+
+        codes = regions.map(self.region_codes).to_numpy(dtype=np.int64)
+        keys = (codes << _REGION_SHIFT) | _day_numbers(df['date'])
+        values = np.column_stack([
+            df[field].to_numpy(dtype=np.float32) if field in df.columns else np.full(len(df), np.nan, dtype=np.float32)
+            for field in DEGREE_DAY_FIELDS
+        ])
+
+        keys = np.concatenate([self._keys, keys])
+        values = np.concatenate([self._values, values])
+        # Keep the last row per key
+        order = np.argsort(keys, kind="stable")
+        keys, values = keys[order], values[order]
+        last = np.append(keys[1:] != keys[:-1], True)
+        self._keys, self._values = keys[last], values[last]
+
+    def _find(self, codes, days):
+        keys = (codes << _REGION_SHIFT) | days
+        pos = np.clip(np.searchsorted(self._keys, keys), 0, max(len(self._keys) - 1, 0))
+        found = (codes >= 0) & (self._keys[pos] == keys) if len(self._keys) else np.zeros(len(keys), dtype=bool)
+        return pos, found
+
+    def lookup(self, regions, dates) -> dict:
+        """
+        Returns {field: float64 array} for each (region, date) reading.
+        regions may be one name or one per reading; rows without their own
+        region fall back to region-less rows, then NaN.
+        """
+
+        days = _day_numbers(dates)
+        n = len(days)
+        if isinstance(regions, str) or regions is None:
+            codes = np.full(n, self.region_codes.get(regions, -1), dtype=np.int64)
+        else:
+            positions, uniques = pd.factorize(np.asarray(regions))
+            unique_codes = np.array([self.region_codes.get(str(r), -1) for r in uniques], dtype=np.int64)
+            codes = np.where(positions >= 0, unique_codes[positions], -1) if len(uniques) else np.full(n, -1)
+
+        values = np.full((n, len(DEGREE_DAY_FIELDS)), np.nan)
+        pos, found = self._find(codes, days)
+        values[found] = self._values[pos[found]]
+
+        any_code = self.region_codes.get(_ANY_REGION)
+        if any_code is not None and not found.all():
+            rest = ~found
+            pos, found_any = self._find(np.full(int(rest.sum()), any_code, dtype=np.int64), days[rest])
+            fallback = values[rest]
+            fallback[found_any] = self._values[pos[found_any]]
+            values[rest] = fallback
+
+        return {field: values[:, i] for i, field in enumerate(DEGREE_DAY_FIELDS)}
+
+
+def load_degree_day_table(path=None):
+    """Builds a DegreeDayTable from a CSV / JSON-lines file; empty if there is none."""
+
+    table = DegreeDayTable()
+    path = Path(path or os.getenv(ENV_PREFIX + "DEGREE_DAYS_FILE", DEFAULT_DEGREE_DAYS_FILE))
+    if not path.is_file():
+        return table
+
+    if path.suffix in (".jsonl", ".ndjson"):
+        df = pd.read_json(path, lines=True)
+    else:
+        df = pd.read_csv(path)
+
+    missing = [col for col in ("date", "hdd", "cdd") if col not in df.columns]
+    if missing:
+        print(f" Skipping degree day file without {missing} columns: {path.name}")
+        return table
+
+    table.add(df)
+    print(f" Degree days loaded: {len(table)} days for {len(table.regions) or 'all'} regions")
+    return table
+
+
+@lru_cache(maxsize=1)
+def get_degree_day_table():
+    """Process-wide degree day table, loaded on first use"""
+    return load_degree_day_table()
@@ -0,0 +1,213 @@
+"""
+Grid carbon intensity lookup for converting kWh into kg CO2.
+
+Intensity tables are read from GREENGAP_GRID_INTENSITY_DIR (default
+app/data/grid_intensity). Every *.csv / *.jsonl file in it may hold either
+
+    region,timestamp,intensity          hourly (or any interval) series
+    region,month,hour,intensity         typical month x hour profile
+    region,month,intensity              monthly averages
+
+with intensity in kg CO2 per kWh. Series take priority over profiles
+while their latest value is at most GRID_INTENSITY_MAX_AGE_DAYS old;
+regions with neither fall back to DEFAULT_EMISSION_FACTOR.
+"""
+
+import os
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import ENV_PREFIX, get_settings
+from app.core.constants import DEFAULT_EMISSION_FACTOR, GRID_INTENSITY_MAX_AGE_DAYS
+
+DEFAULT_INTENSITY_DIR = Path(__file__).resolve().parent.parent / "data" / "grid_intensity"
+
+# Region codes are packed above the epoch seconds in one int64 search key
+_REGION_SHIFT = 36
+_SECONDS_PER_DAY = 86_400
+_SECONDS_MASK = (1 << _REGION_SHIFT) - 1
+
+
+def _to_seconds(timestamps) -> np.ndarray:
+    """Converts timestamps (datetime64 or ISO 8601 strings) to epoch seconds."""
+    values = np.asarray(timestamps)
+    if values.dtype.kind != "M":
+        values = pd.to_datetime(values, format="ISO8601").values
+    values = values.astype("datetime64[s]").astype(np.int64)
+    return np.clip(values, 0, (1 << _REGION_SHIFT) - 1)
+
+
+class GridIntensityTable:
+    """
+    Compact, indexed grid intensity store.
+
+    All regions' series live in one sorted int64 key array
+    (region_code << 36 | epoch_seconds) with a parallel float32 value
+    array, so readings from any mix of regions are resolved with a single
+    np.searchsorted call. Profiles are a dense (regions, 12, 24) array.
+    """
+
+    def __init__(self, default_factor: float = DEFAULT_EMISSION_FACTOR, max_age_days: float = GRID_INTENSITY_MAX_AGE_DAYS):
+        self.default_factor = float(default_factor)
+        self.max_age_seconds = int(max_age_days * _SECONDS_PER_DAY)
+        self.region_codes = {}
+        self._series_keys = np.empty(0, dtype=np.int64)
+        self._series_values = np.empty(0, dtype=np.float32)
+        self._daily_keys = np.empty(0, dtype=np.int64)
+        self._daily_values = np.empty(0, dtype=np.float32)
+        self._profiles = np.full((0, 12, 24), np.nan, dtype=np.float32)
+
+    def _codes(self, regions: pd.Series) -> np.ndarray:
+        """Maps region names to integer codes, registering new regions."""
+        new_regions = [r for r in pd.unique(regions.astype(str)) if r not in self.region_codes]
+        for region in new_regions:
+            self.region_codes[region] = len(self.region_codes)
+        if new_regions:
+            pad = np.full((len(new_regions), 12, 24), np.nan, dtype=np.float32)
+            self._profiles = np.concatenate([self._profiles, pad])
+        return self._region_codes_for(regions)
+
+    def _region_codes_for(self, regions) -> np.ndarray:
+        """Vectorized region name -> code lookup; unknown regions map to -1."""
+        positions, uniques = pd.factorize(np.asarray(regions))
+        unique_codes = np.array([self.region_codes.get(str(r), -1) for r in uniques], dtype=np.int64)
+        return np.where(positions >= 0, unique_codes[positions], -1) if len(uniques) else np.full(len(positions), -1)
+
+    @property
+    def regions(self):
+        return sorted(self.region_codes)
+
+    def add_series(self, df: pd.DataFrame):
+        """Adds region / timestamp / intensity rows."""
+        codes = self._codes(df['region'])
+        seconds = _to_seconds(df['timestamp'])
+        values = df['intensity'].to_numpy(dtype=np.float32)
+
+        keys = np.concatenate([self._series_keys, (codes << _REGION_SHIFT) | seconds])
+        values = np.concatenate([self._series_values, values])
+        order = np.argsort(keys, kind="stable")
+        self._series_keys, self._series_values = keys[order], values[order]
+        self._rebuild_daily()
+
+    def add_profile(self, df: pd.DataFrame):
+        """Adds region / month / [hour] / intensity rows."""
+        codes = self._codes(df['region'])
+        months = df['month'].to_numpy(dtype=np.int64) - 1
+        values = df['intensity'].to_numpy(dtype=np.float32)
+
+        if 'hour' in df.columns:
+            self._profiles[codes, months, df['hour'].to_numpy(dtype=np.int64)] = values
+        else:
+            self._profiles[codes, months, :] = values[:, None]
+
+    def _rebuild_daily(self):
+        """Pre-aggregates series into daily means for daily meter readings."""
+        if not len(self._series_keys):
+            return
+        day_keys = self._series_keys - (self._series_keys & _SECONDS_MASK) % _SECONDS_PER_DAY
+        unique_days, inverse = np.unique(day_keys, return_inverse=True)
+        sums = np.bincount(inverse, weights=self._series_values)
+        counts = np.bincount(inverse)
+        self._daily_keys = unique_days
+        self._daily_values = (sums / counts).astype(np.float32)
+
+    def lookup(self, regions, timestamps, daily: bool = False) -> np.ndarray:
+        """
+        Returns kg CO2/kWh for each (region, timestamp) reading.
+
+        regions may be a single region name or one per reading. Series
+        values hold from their timestamp until the next one, for at most
+        max_age_seconds; readings before a region's first value, past that
+        age, or in regions without a series, use the month x hour profile
+        and then the default factor.
+        daily=True matches readings against daily mean intensities.
+        """
+
+        seconds = _to_seconds(timestamps)
+        n = len(seconds)
+
+        if isinstance(regions, str) or regions is None:
+            code = self.region_codes.get(regions, -1)
+            codes = np.full(n, code, dtype=np.int64)
+        else:
+            codes = self._region_codes_for(regions)
+
+        result = np.full(n, np.nan, dtype=np.float32)
+        known = codes >= 0
+
+        if daily:
+            table_keys, table_values = self._daily_keys, self._daily_values
+            seconds = seconds - seconds % _SECONDS_PER_DAY
+        else:
+            table_keys, table_values = self._series_keys, self._series_values
+
+        if len(table_keys) and known.any():
+            keys = (codes[known] << _REGION_SHIFT) | seconds[known]
+            pos = np.searchsorted(table_keys, keys, side="right") - 1
+            matched = table_keys[np.maximum(pos, 0)]
+            same_region = (pos >= 0) & ((matched >> _REGION_SHIFT) == codes[known])
+            fresh = seconds[known] - (matched & _SECONDS_MASK) <= self.max_age_seconds
+            found = np.where(same_region & fresh, table_values[np.maximum(pos, 0)], np.nan)
+            result[known] = found
+
+        missing = np.isnan(result) & known
+        if missing.any() and len(self._profiles):
+            stamps = pd.to_datetime(seconds[missing], unit="s")
+            months = stamps.month.to_numpy() - 1
+            if daily:
+                hours = self._profiles[codes[missing], months, :]
+                filled = (~np.isnan(hours)).sum(axis=1)
+                profile = np.where(filled > 0, np.nansum(hours, axis=1) / np.maximum(filled, 1), np.nan)
+            else:
+                profile = self._profiles[codes[missing], months, stamps.hour.to_numpy()]
+            result[missing] = profile
+
+        return np.where(np.isnan(result), self.default_factor, result)
+
+    def emissions_kg(self, kwh, regions, timestamps, daily: bool = False) -> np.ndarray:
+        """Converts kWh readings into kg CO2 using the looked-up intensities."""
+        return np.asarray(kwh, dtype=np.float64) * self.lookup(regions, timestamps, daily=daily)
+
+
+def load_intensity_table(
+    directory=None,
+    default_factor: float = DEFAULT_EMISSION_FACTOR,
+    max_age_days: float = GRID_INTENSITY_MAX_AGE_DAYS,
+):
+    """Builds a GridIntensityTable from every table file in a directory."""
+
+    table = GridIntensityTable(default_factor=default_factor, max_age_days=max_age_days)
+    directory = Path(directory or os.getenv(ENV_PREFIX + "GRID_INTENSITY_DIR") or DEFAULT_INTENSITY_DIR)
+    if not directory.is_dir():
+        return table
+
+    for path in sorted(directory.iterdir()):
+        if path.suffix == ".csv":
+            df = pd.read_csv(path)
+        elif path.suffix in (".jsonl", ".ndjson"):
+            df = pd.read_json(path, lines=True)
+        else:
+            continue
+
+        if 'timestamp' in df.columns:
+            table.add_series(df)
+        elif 'month' in df.columns:
+            table.add_profile(df)
+        else:
+            print(f" Skipping grid intensity file without timestamp/month columns: {path.name}")
+
+    print(f" Grid intensity loaded for {len(table.region_codes)} regions")
+    return table
+
+
+@lru_cache(maxsize=1)
+def get_intensity_table():
+    """Process-wide intensity table, loaded on first use"""
+    settings = get_settings()
+    return load_intensity_table(
+        default_factor=settings.default_emission_factor,
+        max_age_days=settings.grid_intensity_max_age_days,
+    )
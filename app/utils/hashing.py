@@ -0,0 +1,38 @@
+import hashlib
+import json
+
+import numpy as np
+
+
+def _json_default(value):
+    """Makes numpy values and other non-JSON types hashable in a stable way."""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    if isinstance(value, bytes):
+        return hashlib.sha256(value).hexdigest()
+    return str(value)
+
+
+def canonical_json(payload) -> bytes:
+    """
+    Serializes a payload with sorted keys and no whitespace so equal
+    inputs always produce identical bytes.
+    """
+    return json.dumps(
+        payload,
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+        default=_json_default,
+    ).encode("utf-8")
+
+
+def fingerprint(payload) -> str:
+    """Returns the SHA-256 hex digest of a payload's canonical JSON form."""
+    if isinstance(payload, bytes):
+        return hashlib.sha256(payload).hexdigest()
+    return hashlib.sha256(canonical_json(payload)).hexdigest()
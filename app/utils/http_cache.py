@@ -0,0 +1,53 @@
+from fastapi import Request
+from fastapi.responses import Response
+
+from app.utils.hashing import fingerprint
+
+
+def make_etag(payload, weak: bool = False) -> str:
+    """Builds a quoted ETag from a payload (dict, list or raw bytes)."""
+    tag = f'"{fingerprint(payload)[:32]}"'
+    return f"W/{tag}" if weak else tag
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Checks the request's If-None-Match header against an ETag.
+    Comparison is weak, as RFC 9110 requires for If-None-Match.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+
+    def _opaque(tag):
+        tag = tag.strip()
+        return tag[2:] if tag.startswith("W/") else tag
+
+    wanted = _opaque(etag)
+    return any(_opaque(candidate) == wanted for candidate in header.split(","))
+
+
+def cached_response(
+    request: Request,
+    body: bytes,
+    etag: str,
+    media_type: str = "application/json",
+    max_age: int = 300,
+    vary: str = None,
+) -> Response:
+    """
+    Returns a 304 when the client already holds this ETag, otherwise the
+    full body with ETag and Cache-Control headers attached. Pass vary when
+    the body depends on a request header (e.g. the tenant ID).
+    """
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={max_age}",
+    }
+    if vary:
+        headers["Vary"] = vary
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
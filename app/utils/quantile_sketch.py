@@ -0,0 +1,119 @@
+"""
+Mergeable quantile sketch (KLL) for fleet-wide distributions.
+
+A KLLSketch summarizes any number of values in O(k log(n / k)) floats
+with rank error around 1.7 / k, and two sketches of disjoint value sets
+merge into a sketch of their union, so worker processes can each
+summarize their own sites and ship the sketches (to_dict / from_dict)
+instead of the values.
+"""
+
+import numpy as np
+
+DEFAULT_K = 200
+
+# Each level below the top may hold this fraction of the next one's capacity
+_CAPACITY_DECAY = 2 / 3
+
+
+class KLLSketch:
+    """
+    Levels of sampled values; an item on level h stands for 2**h values.
+    A level over capacity is sorted and every other item (random offset)
+    is promoted, halving it while keeping the rank of any value within
+    the error bound. Queries use a sorted view with cumulative weights,
+    built once per change, so rank and quantile are np.searchsorted calls.
+    """
+
+    def __init__(self, k: int = DEFAULT_K, seed=None):
+        self.k = k
+        self.n = 0
+        self.total = 0.0
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+        self._view = None
+
+    def __len__(self):
+        return self.n
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(2, int(np.ceil(self.k * _CAPACITY_DECAY ** depth)))
+
+    def add(self, values):
+        """Adds a value or an array of values; NaN / inf are ignored."""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[np.isfinite(values)]
+        if len(values):
+            self.levels[0] = np.concatenate([self.levels[0], values])
+            self.n += len(values)
+            self.total += float(values.sum())
+            self._compress()
+
+    def merge(self, other: "KLLSketch"):
+        """Folds in another sketch (of different values) in place."""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self.total += other.total
+        self._compress()
+        return self
+
+    def _compress(self):
+        self._view = None
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # An odd item out stays behind at its own weight
+                keep, items = (items[-1:], items[:-1]) if len(items) % 2 else (items[:0], items)
+                promoted = items[self._rng.integers(2)::2]
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+                self.levels[level] = keep
+            level += 1
+
+    def _sorted_view(self):
+        if self._view is None:
+            items = np.concatenate(self.levels)
+            weights = np.concatenate([np.full(len(items), 2.0 ** level) for level, items in enumerate(self.levels)])
+            order = np.argsort(items, kind="stable")
+            self._view = items[order], np.cumsum(weights[order])
+        return self._view
+
+    def rank(self, value: float) -> float:
+        """Estimated fraction of values below `value`, counting ties as half."""
+        if not self.n:
+            return 0.0
+        items, cumulative = self._sorted_view()
+        below, through = np.searchsorted(items, value, side="left"), np.searchsorted(items, value, side="right")
+        weight_below = cumulative[below - 1] if below else 0.0
+        weight_through = cumulative[through - 1] if through else 0.0
+        return float((weight_below + weight_through) / 2 / self.n)
+
+    def mean(self) -> float:
+        """Exact mean of the added values (kept as a running sum); NaN for an empty sketch."""
+        return self.total / self.n if self.n else float("nan")
+
+    def quantile(self, q: float) -> float:
+        """Estimated q-quantile (0 <= q <= 1); NaN for an empty sketch."""
+        if not self.n:
+            return float("nan")
+        items, cumulative = self._sorted_view()
+        pos = np.searchsorted(cumulative, q * self.n, side="left")
+        return float(items[min(pos, len(items) - 1)])
+
+    def to_dict(self) -> dict:
+        return {"k": self.k, "n": self.n, "sum": self.total, "levels": [items.tolist() for items in self.levels]}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "KLLSketch":
+        sketch = cls(k=int(data.get("k", DEFAULT_K)))
+        sketch.n = int(data["n"])
+        sketch.total = float(data["sum"])
+        sketch.levels = [np.asarray(items, dtype=np.float64) for items in data["levels"]] or [np.empty(0)]
+        return sketch
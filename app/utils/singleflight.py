@@ -0,0 +1,63 @@
+import asyncio
+import threading
+
+from starlette.concurrency import run_in_threadpool
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls into one computation.
+
+    The first caller for a key starts the work in the thread pool; callers
+    that arrive while it is running await the same task and get the same
+    result (or exception). The key is forgotten once the task finishes, so
+    this deduplicates in-flight work only; results are not cached.
+
+    The work runs as its own task, so a caller disconnecting does not
+    cancel it for the others waiting on it.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._tasks = {}
+        self._lock = threading.Lock()
+        self.started = 0
+        self.shared = 0
+
+    def pending(self, key) -> bool:
+        """True if a computation for key is running right now."""
+        return key in self._tasks
+
+    async def do(self, key, fn, *args, **kwargs):
+        """
+        Runs fn(*args, **kwargs) in a worker thread, or joins the running
+        call for the same key. Returns (result, shared).
+        """
+        with self._lock:
+            task = self._tasks.get(key)
+            shared = task is not None
+            if shared:
+                self.shared += 1
+            else:
+                self.started += 1
+                task = asyncio.ensure_future(run_in_threadpool(fn, *args, **kwargs))
+                self._tasks[key] = task
+                task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(task), shared
+
+    def _forget(self, key, task):
+        with self._lock:
+            if self._tasks.get(key) is task:
+                del self._tasks[key]
+        # Mark the exception as retrieved even if every caller went away
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "name": self.name,
+                "in_flight": len(self._tasks),
+                "started": self.started,
+                "shared": self.shared
+            }
@@ -0,0 +1,35 @@
+import json
+import re
+
+from fastapi.responses import StreamingResponse
+
+_WORDS = re.compile(r"\s*\S+\s*")
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    # Stops nginx-style proxies from buffering the stream
+    "X-Accel-Buffering": "no",
+}
+
+
+def sse_event(data, event: str = None) -> str:
+    """Formats one Server-Sent Event with a JSON data line."""
+    message = f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+    return f"event: {event}\n{message}" if event else message
+
+
+def text_chunks(text: str, words_per_chunk: int = 4):
+    """
+    Splits prewritten text into small word groups so fallback answers
+    stream the same way model tokens do. Joining the chunks gives back
+    the original text.
+    """
+    words = _WORDS.findall(text)
+    for i in range(0, len(words), words_per_chunk):
+        yield "".join(words[i:i + words_per_chunk])
+
+
+def event_stream_response(events) -> StreamingResponse:
+    """Wraps an iterator of formatted SSE strings in a text/event-stream response."""
+    return StreamingResponse(events, media_type="text/event-stream", headers=SSE_HEADERS)
@@ -0,0 +1,61 @@
+import io
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+from app.data.ingest import REQUIRED_COLUMNS, iter_energy_file, read_energy_file
+from app.data.parsers import PARSERS, sniff_format
+
+
+def _xlsx(rows) -> bytes:
+    workbook = Workbook()
+    sheet = workbook.active
+    for row in rows:
+        sheet.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def test_header_only_xlsx_is_empty_data():
+    contents = _xlsx([REQUIRED_COLUMNS])
+
+    with pytest.raises(pd.errors.EmptyDataError):
+        read_energy_file(contents, "readings.xlsx")
+    with pytest.raises(pd.errors.EmptyDataError):
+        PARSERS["xlsx"]["openpyxl-stream"](contents)
+    chunks, _ = iter_energy_file(contents, "readings.xlsx")
+    with pytest.raises(pd.errors.EmptyDataError):
+        list(chunks)
+
+
+def test_xlsx_with_rows_parses():
+    contents = _xlsx([REQUIRED_COLUMNS, ["2024-01-01", 100, 80, 0.25], ["2024-01-02", 100, 85, 0.25]])
+
+    df, _ = read_energy_file(contents, "readings.xlsx")
+    assert len(df) == 2
+    assert df["actual_kwh"].tolist() == [80, 85]
+
+
+@pytest.mark.parametrize("orient", ["columns", "index"])
+def test_single_line_json_document_is_json(orient):
+    frame = pd.DataFrame({
+        "date": ["2024-01-01", "2024-01-02"],
+        "baseline_kwh": [100.0, 100.0],
+        "actual_kwh": [80.0, 85.0],
+        "efficiency_improvement": [0.25, 0.25],
+    })
+    contents = frame.to_json(orient=orient).encode()
+
+    assert sniff_format(contents) == "json"
+    if orient == "columns":
+        df, _ = read_energy_file(contents, "readings.json")
+        assert df["actual_kwh"].tolist() == [80, 85]
+
+
+def test_json_lines_are_jsonl():
+    contents = b'{"date": "2024-01-01", "actual_kwh": 80}\n{"date": "2024-01-02", "actual_kwh": 85}\n'
+
+    assert sniff_format(contents) == "jsonl"
+    assert sniff_format(contents.split(b"\n")[0]) == "jsonl"
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from app.data.ingest import compact_frame
+from app.data.quality import clean_energy_frame
+
+
+def _frame(dates, efficiency=0.25):
+    return compact_frame(pd.DataFrame({
+        "date": dates,
+        "baseline_kwh": 100.0,
+        "actual_kwh": 80.0,
+        "efficiency_improvement": efficiency,
+    }))
+
+
+def test_no_valid_rows_returns_empty_frame():
+    clean, report = clean_energy_frame(_frame(["2024-01-01", "2024-01-02"], efficiency=np.nan))
+
+    assert clean.empty
+    assert report["output_rows"] == 0
+    assert report["invalid_rows"] == 2
+
+
+def test_header_only_frame_returns_empty_frame():
+    clean, report = clean_energy_frame(_frame(pd.Series([], dtype="datetime64[ns]")))
+
+    assert clean.empty
+    assert report["input_rows"] == 0
+
+
+def test_monthly_readings_are_kept_as_they_are():
+    dates = pd.date_range("2024-01-01", periods=12, freq="MS")
+    clean, report = clean_energy_frame(_frame(dates))
+
+    assert len(clean) == 12
+    assert list(clean["date"]) == list(dates)
+    assert report["resampled"] is False
+    assert report["duplicates"] == 0
+
+
+def test_missing_day_is_interpolated():
+    clean, report = clean_energy_frame(_frame(["2024-01-01", "2024-01-03", "2024-01-05", "2024-01-06"]))
+
+    assert report["interval_minutes"] == 24 * 60
+    assert report["interpolated_steps"] == 2
+    assert len(clean) == 6
+
+
+def test_outliers_are_flagged_not_repaired_by_default():
+    df = _frame(pd.date_range("2024-01-01", periods=30, freq="D"))
+    df.loc[15, "actual_kwh"] = 5000.0
+    clean, report = clean_energy_frame(df)
+
+    assert report["outliers"]["actual_kwh"] == 1
+    assert report["outliers_repaired"] is False
+    assert clean.loc[15, "actual_kwh"] == 5000.0
@@ -0,0 +1,62 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import get_settings
+from app.db.rollup_store import PORTFOLIO, RollupTree, unassigned_group
+from app.main import app
+from app.services.site_stats import SUM_FIELDS
+
+
+def _delta(value: float) -> dict:
+    return {name: value for name in SUM_FIELDS}
+
+
+def test_ungrouped_sites_in_different_regions():
+    tree = RollupTree()
+    tree.place("a", region="EU")
+    tree.place("b", region="US")
+    tree.add("a", _delta(1.0), 1)
+    tree.add("b", _delta(2.0), 1)
+
+    assert tree.placement("a") == (unassigned_group("EU"), "EU")
+    assert tree.placement("b") == (unassigned_group("US"), "US")
+    assert tree.node(PORTFOLIO, PORTFOLIO, get_settings())["data_points"] == 2
+
+
+def test_ungrouped_site_follows_its_region():
+    tree = RollupTree()
+    tree.place("a", region="EU")
+    tree.add("a", _delta(1.0), 3)
+    tree.place("a", region="US")
+
+    assert tree.placement("a") == (unassigned_group("US"), "US")
+    assert tree.node("group", unassigned_group("EU"), get_settings()) is None
+    assert tree.node("region", "US", get_settings())["data_points"] == 3
+
+
+def test_named_group_keeps_one_region():
+    tree = RollupTree()
+    tree.place("a", group="hq", region="EU")
+    tree.place("b", group="hq", region="EU")
+    with pytest.raises(ValueError):
+        tree.place("c", group="hq", region="US")
+
+
+def _csv(region: str) -> bytes:
+    rows = ["date,baseline_kwh,actual_kwh,efficiency_improvement,region"]
+    rows += [f"2024-01-{day:02d},100,80,25,{region}" for day in range(1, 6)]
+    return "\n".join(rows).encode()
+
+
+def test_append_ungrouped_sites_in_different_regions():
+    client = TestClient(app)
+    for site_id, region in (("rollup-a", "EU"), ("rollup-b", "US")):
+        response = client.post(
+            f"/v1/sites/{site_id}/append",
+            params={"region": region},
+            files={"file": (f"{site_id}.csv", _csv(region), "text/csv")},
+        )
+        assert response.status_code == 200, response.text
+
+    regions = client.get("/v1/rollups", params={"depth": 1}).json()["children"]
+    assert {"EU", "US"} <= {region["name"] for region in regions}